@@ -0,0 +1,34 @@
+import random
+from GameStates import calculate_nim_value_anytime
+
+# Name used for the computer player in the game
+COMPUTER_PLAYER = "Computer"
+
+# Search budget in seconds for each difficulty level. The hard budget stays under one frame at 60 FPS.
+DIFFICULTY_BUDGETS = {
+    "easy": 0.001,
+    "medium": 0.005,
+    "hard": 0.015
+}
+
+
+def choose_move(board, state, difficulty="medium"):
+    """
+    Choose a move for the computer player. A move to a position with Nim value 0 wins, so the computer runs an
+    anytime search with the budget of the difficulty level; cached Nim values answer without any search. If no
+    winning move is found it plays a random move that is not known to lose.
+
+    Args:
+        board (Board): The board the game is played on.
+        state (tuple): The current state.
+        difficulty (str, optional): One of the keys of DIFFICULTY_BUDGETS. Defaults to "medium".
+
+    Returns:
+        tuple: The (kind, element ID, next state) of the chosen move.
+    """
+    result = calculate_nim_value_anytime(board, state, time_budget=DIFFICULTY_BUDGETS[difficulty])
+    winning_moves = result.winning_moves
+    if winning_moves:
+        return winning_moves[0]
+    unknown = [move for move, nim_value in result.moves if nim_value is None]
+    return random.choice(unknown or [move for move, _ in result.moves])
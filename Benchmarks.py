@@ -0,0 +1,238 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import GameStates
+import SolverBackends
+import SolverStats
+from Board import Board
+
+# The Tripartite Graphs calculator opens a Pygame window when it is imported, so keep it off screen
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+# Time the solvers, never lookups in precomputed packs
+GameStates.use_packs = False
+
+# A workload is slower than the baseline when its states/second drop by more than this fraction
+DEFAULT_TOLERANCE = 0.2
+
+
+def tripartite_module():
+    import TripartiteGraphs
+    return TripartiteGraphs
+
+
+# Each engine is (function importing its module, function returning the size of its memo tables).
+# calculate_nim_value memoizes in all three tables, like the recursive backend.
+ENGINES = {
+    "calculate_nim_value": (lambda: GameStates, lambda: len(GameStates.board_nim_values)
+                            + len(GameStates.canonical_nim_values) + len(GameStates.nim_values)),
+    "calculate_nim_value_without_hyperedges": (lambda: GameStates, lambda: len(GameStates.nim_values)),
+    "getNimValue": (tripartite_module, lambda: len(GameStates.nim_values)),
+}
+# Every solver backend is an engine as well, measured on the same grids to compare them
+backends = {name: SolverBackends.get_backend(name) for name in SolverBackends.BACKENDS}
+for name, backend in backends.items():
+    ENGINES[f"backend-{name}"] = (lambda: GameStates, backend.memo_size)
+
+
+def grid_workload(rows, cols):
+    """
+    Solve the full nxm grid with calculate_nim_value.
+    """
+    vertices, edges, hyperedges = Board.grid(rows, cols).to_lists(Board.grid(rows, cols).full_state)
+    return lambda: GameStates.calculate_nim_value(vertices, edges, hyperedges)
+
+
+def random_board_workload(rows, cols, removals, seed):
+    """
+    Solve a sub-board of the nxm grid reached by playing random moves with calculate_nim_value.
+    """
+    rng = random.Random(seed)
+    board = Board.grid(rows, cols)
+    state = board.full_state
+    for _ in range(removals):
+        state = rng.choice(board.moves(state))[2]
+    # Solve the board state directly: calculate_nim_value would hand hyperedge-free positions to another engine
+    return lambda: GameStates.calculate_board_nim_value(board, state)
+
+
+def backend_workload(rows, cols, name):
+    """
+    Solve the full nxm grid with a solver backend.
+    """
+    board = Board.grid(rows, cols)
+    return lambda: backends[name].solve((board, board.full_state))
+
+
+def tripartite_edges(a, b, c):
+    """
+    The edges of the complete tripartite graph K_{a,b,c}.
+    """
+    parts = [range(0, a), range(a, a + b), range(a + b, a + b + c)]
+    return [(u, v) for i, part in enumerate(parts) for other in parts[i + 1:] for u in part for v in other]
+
+
+def tripartite_workload(a, b, c, engine):
+    """
+    Solve the complete tripartite graph K_{a,b,c} with getNimValue or calculate_nim_value_without_hyperedges.
+    """
+    edges = tripartite_edges(a, b, c)
+    if engine == "getNimValue":
+        def run():
+            import numpy as np
+            module = tripartite_module()
+            graph = module.attachEdges(np.zeros((a + b + c, a + b + c), dtype=int), edges)
+            return int(module.getNimValue(graph))
+        return run
+    # Vertex coordinates off the grid centers so the graph is not mistaken for a grid position
+    vertices = [(i, 0) for i in range(a + b + c)]
+    return lambda: GameStates.calculate_nim_value_without_hyperedges(vertices, edges)
+
+
+def get_workloads():
+    """
+    The fixed benchmark workloads.
+
+    Returns:
+        list: List of (name, group, engine, run) tuples.
+    """
+    workloads = []
+    for rows, cols in [(2, 2), (2, 3), (2, 4), (2, 5), (3, 2), (3, 3)]:
+        workloads.append((f"grid-{rows}x{cols}", "grid", "calculate_nim_value", grid_workload(rows, cols)))
+    for seed in range(3):
+        workloads.append((f"random-3x4-seed{seed}", "random", "calculate_nim_value", random_board_workload(3, 4, 4, seed)))
+    for a, b, c in [(1, 1, 1), (1, 1, 2), (1, 2, 2), (2, 2, 2)]:
+        for engine in ["calculate_nim_value_without_hyperedges", "getNimValue"]:
+            workloads.append((f"K{a},{b},{c}-{engine}", "tripartite", engine, tripartite_workload(a, b, c, engine)))
+    for rows, cols in [(2, 4), (3, 3)]:
+        for name in backends:
+            workloads.append((f"grid-{rows}x{cols}-{name}", "backends", f"backend-{name}", backend_workload(rows, cols, name)))
+    return workloads
+
+
+def measure(engine, run, repeat=1):
+    """
+    Benchmark one workload from an empty memo table.
+
+    The time is taken from plain runs. A separate run with tracemalloc and SolverStats instrumentation measures the
+    peak memory and the cache hits.
+
+    Args:
+        engine (str): One of the keys of ENGINES.
+        run (function): Runs the workload and returns its Nim value.
+        repeat (int, optional): Number of timed runs; the fastest is kept. Defaults to 1.
+
+    Returns:
+        dict: The measurements.
+    """
+    get_module, get_memo_size = ENGINES[engine]
+    get_module()
+
+    def clear():
+        # The engines share their tables: calculate_nim_value hands positions without hyperedges to the graph table
+        for table in [GameStates.board_nim_values, GameStates.canonical_nim_values, GameStates.nim_values,
+                      GameStates.graph_buckets, GameStates.winning_positions,
+                      GameStates.canonical_winning_positions]:
+            table.clear()
+        for backend in backends.values():
+            backend.clear()
+
+    elapsed = None
+    for _ in range(repeat):
+        clear()
+        start = time.perf_counter()
+        nim_value = run()
+        run_time = time.perf_counter() - start
+        elapsed = run_time if elapsed is None else min(elapsed, run_time)
+    memo_size = get_memo_size()
+
+    clear()
+    stats = SolverStats.enable_instrumentation()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        SolverStats.disable_instrumentation()
+    clear()
+
+    return {
+        'engine': engine,
+        'nim_value': nim_value,
+        'seconds': elapsed,
+        'states': memo_size,
+        'states_per_second': memo_size / elapsed if elapsed else 0.0,
+        'peak_memory_bytes': peak_memory,
+        'memo_size': memo_size,
+        'calls': stats.hits + stats.misses,
+        'cache_hit_rate': stats.hit_rate,
+    }
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare benchmark results against a baseline.
+
+    Args:
+        results (dict): The current results by workload name.
+        baseline (dict): The baseline results by workload name.
+        tolerance (float, optional): Allowed drop in states/second. Defaults to DEFAULT_TOLERANCE.
+
+    Returns:
+        list: Descriptions of every regression; empty if there are none.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]
+        if result['nim_value'] != old['nim_value']:
+            regressions.append(f"{name}: Nim value changed from {old['nim_value']} to {result['nim_value']}")
+        if old['states_per_second'] and result['states_per_second'] < (1 - tolerance) * old['states_per_second']:
+            regressions.append(f"{name}: {result['states_per_second']:.0f} states/s, baseline {old['states_per_second']:.0f} states/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Nim value engines on fixed workloads.")
+    parser.add_argument("--groups", nargs="+", choices=["grid", "random", "tripartite", "backends"], default=["grid", "random", "tripartite", "backends"], help="workload groups to run")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per workload; the fastest is kept")
+    parser.add_argument("--output", default="bench_results.json", help="file to write the results to")
+    parser.add_argument("--baseline", default="bench_baseline.json", help="baseline results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="also store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed drop in states/second")
+    args = parser.parse_args()
+
+    results = {}
+    for name, group, engine, run in get_workloads():
+        if group not in args.groups:
+            continue
+        result = measure(engine, run, args.repeat)
+        results[name] = result
+        print(f"{name:45} {result['seconds']:9.3f}s {result['states_per_second']:12.0f} states/s "
+              f"{result['peak_memory_bytes'] / 2**20:8.1f} MiB  memo {result['memo_size']:8}  hit rate {result['cache_hit_rate']:.2f}")
+
+    report = {'python': platform.python_version(), 'time': time.strftime("%Y-%m-%dT%H:%M:%S"), 'results': results}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)['results'], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
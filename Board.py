@@ -0,0 +1,407 @@
+import hashlib
+
+
+def iter_bits(mask):
+    """
+    Iterates over the indices of the set bits of a mask, lowest first.
+
+    Args:
+        mask (int): A bitmask.
+
+    Yields:
+        int: The index of each set bit.
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def permutation_tables(permutation):
+    """
+    Lookup tables that apply a permutation of bit indices to a mask one byte at a time.
+
+    Args:
+        permutation (list): The new index of every bit.
+
+    Returns:
+        list: One 256-entry table per byte of the mask.
+    """
+    tables = []
+    for start in range(0, len(permutation), 8):
+        bits = permutation[start:start + 8]
+        tables.append([sum(1 << bits[i] for i in range(len(bits)) if byte >> i & 1) for byte in range(256)])
+    return tables
+
+
+def permute_mask(mask, tables):
+    """
+    Applies the permutation described by permutation_tables to a mask.
+    """
+    permuted = 0
+    for table in tables:
+        if not mask:
+            break
+        permuted |= table[mask & 0xFF]
+        mask >>= 8
+    return permuted
+
+
+def encode_state(state):
+    """
+    Encodes a state as compact text: the three masks in hexadecimal separated by dots.
+
+    Args:
+        state (tuple): The (vertex_mask, edge_mask, hyperedge_mask) state.
+
+    Returns:
+        str: The encoded state, for example "f.f.1".
+    """
+    return ".".join(f"{mask:x}" for mask in state)
+
+
+def decode_state(text):
+    """
+    Decodes a state encoded by encode_state.
+
+    Args:
+        text (str): The encoded state.
+
+    Returns:
+        tuple: The (vertex_mask, edge_mask, hyperedge_mask) state.
+    """
+    return tuple(int(mask, 16) for mask in text.split("."))
+
+
+def grid_size(key):
+    """
+    The size of a grid board from its key.
+
+    Args:
+        key (str): The key of a board.
+
+    Returns:
+        tuple: The rows and columns, or (None, None) if the board is not a grid.
+    """
+    rows, x, cols = key.partition("x")
+    if x and rows.isdigit() and cols.isdigit():
+        return int(rows), int(cols)
+    return None, None
+
+
+# Grid boards never change once built, so every caller shares one instance per size
+grids = {}
+
+# Every board by its key, so stored positions can be turned back into states of a board
+boards = {}
+
+
+def board_for_key(key):
+    """
+    Finds the board stored positions with this key belong to.
+
+    Args:
+        key (str): The key of a board.
+
+    Returns:
+        Board: The board.
+
+    Raises:
+        KeyError: If the key is not a grid and no board with this key has been built.
+    """
+    if key in boards:
+        return boards[key]
+    rows, cols = grid_size(key)
+    if rows is None:
+        raise KeyError(key)
+    return Board.grid(rows, cols)
+
+
+class Board:
+    """
+    The layout of a Take-Away board with stable element IDs.
+
+    Every vertex, edge and hyperedge keeps the index it was created with for the whole game. A position on the board
+    is a state tuple (vertex_mask, edge_mask, hyperedge_mask) where bit i is set while element i is still alive, so a
+    move only clears a few bits and states from different moves can be compared directly. The same state tuples are
+    used by the GUI and by the solver in GameStates.py.
+    """
+    __slots__ = ('key', 'rows', 'cols', 'vertices', 'edges', 'hyperedges', 'vertex_edges', 'vertex_hyperedges', 'edge_hyperedges',
+                 'vertex_ids', 'full_state', 'symmetries')
+
+    def __init__(self, vertices, edges, hyperedges, rows=None, cols=None):
+        """
+        Args:
+            vertices (list): List of vertex coordinates.
+            edges (list): List of edges (pairs of vertex indices).
+            hyperedges (list): List of hyperedges (tuples of vertex indices).
+            rows (int, optional): Number of rows if the board is an nxm grid.
+            cols (int, optional): Number of columns if the board is an nxm grid.
+        """
+        self.vertices = [tuple(vertex) for vertex in vertices]
+        self.edges = [tuple(edge) for edge in edges]
+        self.hyperedges = [tuple(hyperedge) for hyperedge in hyperedges]
+        self.rows = rows
+        self.cols = cols
+
+        # Grid boards are named by their size, any other board by a digest of its layout. Either way the key only
+        # depends on the incidence structure, so states of equal boards can share memo entries.
+        if rows is not None and cols is not None:
+            self.key = f"{rows}x{cols}"
+        else:
+            layout = repr((len(self.vertices), self.edges, self.hyperedges)).encode()
+            self.key = hashlib.sha1(layout).hexdigest()[:16]
+
+        # Incidence masks: the edges and hyperedges that disappear together with each vertex
+        self.vertex_edges = [0] * len(self.vertices)
+        self.vertex_hyperedges = [0] * len(self.vertices)
+        for e, edge in enumerate(self.edges):
+            for v in edge:
+                self.vertex_edges[v] |= 1 << e
+        for h, hyperedge in enumerate(self.hyperedges):
+            for v in hyperedge:
+                self.vertex_hyperedges[v] |= 1 << h
+        # The hyperedges that contain each edge, at most two on a grid
+        self.edge_hyperedges = [self.vertex_hyperedges[v1] & self.vertex_hyperedges[v2] for v1, v2 in self.edges]
+
+        self.vertex_ids = {vertex: v for v, vertex in enumerate(self.vertices)}
+        self.full_state = ((1 << len(self.vertices)) - 1, (1 << len(self.edges)) - 1, (1 << len(self.hyperedges)) - 1)
+        # Automorphisms of the board other than the identity, see add_symmetries
+        self.symmetries = []
+        boards.setdefault(self.key, self)
+
+    @classmethod
+    def grid(cls, rows, cols, cell_size=75):
+        """
+        Builds the nxm grid board used by the game.
+
+        Args:
+            rows (int): Number of rows in the board.
+            cols (int): Number of columns in the board.
+            cell_size (int, optional): The size of a cell in pixels. Defaults to 75.
+
+        Returns:
+            Board: The grid board.
+        """
+        if (rows, cols, cell_size) in grids:
+            return grids[(rows, cols, cell_size)]
+        vertices = [(col * cell_size + cell_size // 2, row * cell_size + cell_size // 2) for row in range(rows) for col in range(cols)]
+        edges = [(row * cols + col, row * cols + col + 1) for row in range(rows) for col in range(cols - 1)] + [(row * cols + col, (row + 1) * cols + col) for row in range(rows - 1) for col in range(cols)]
+        hyperedges = [(row * cols + col, row * cols + col + 1, (row + 1) * cols + col + 1, (row + 1) * cols + col) for row in range(rows - 1) for col in range(cols - 1)]
+        board = cls(vertices, edges, hyperedges, rows, cols)
+        # The reflections and the half turn of the grid, and on square grids the quarter turns and diagonal reflections
+        maps = [lambda r, c: (r, cols - 1 - c), lambda r, c: (rows - 1 - r, c), lambda r, c: (rows - 1 - r, cols - 1 - c)]
+        if rows == cols:
+            maps += [lambda r, c: (c, r), lambda r, c: (cols - 1 - c, rows - 1 - r), lambda r, c: (c, rows - 1 - r), lambda r, c: (cols - 1 - c, r)]
+        board.add_symmetries([[row * cols + col for row, col in (f(v // cols, v % cols) for v in range(rows * cols))] for f in maps])
+        grids[(rows, cols, cell_size)] = board
+        return board
+
+    def add_symmetries(self, vertex_permutations):
+        """
+        Registers automorphisms of the board, so solvers can skip moves that are symmetric to moves they already
+        searched (see distinct_moves). Each is given by where it sends every vertex; the edges and hyperedges follow.
+        Together with the identity, the symmetries of a board must form a group.
+
+        Args:
+            vertex_permutations (list): Lists with the new ID of every vertex.
+
+        Raises:
+            ValueError: If a permutation does not map every edge to an edge and every hyperedge to a hyperedge.
+        """
+        edge_ids = {frozenset(edge): e for e, edge in enumerate(self.edges)}
+        hyperedge_ids = {frozenset(hyperedge): h for h, hyperedge in enumerate(self.hyperedges)}
+        for vertex_permutation in vertex_permutations:
+            try:
+                edge_permutation = [edge_ids[frozenset(vertex_permutation[v] for v in edge)] for edge in self.edges]
+                hyperedge_permutation = [hyperedge_ids[frozenset(vertex_permutation[v] for v in hyperedge)] for hyperedge in self.hyperedges]
+            except KeyError:
+                raise ValueError("The permutation is not an automorphism of the board.") from None
+            permutations = (vertex_permutation, edge_permutation, hyperedge_permutation)
+            self.symmetries.append((permutations, tuple(permutation_tables(permutation) for permutation in permutations)))
+
+    def apply_symmetry(self, symmetry, state):
+        """
+        The image of a state under one of the board's symmetries.
+        """
+        _, tables = symmetry
+        return tuple(permute_mask(mask, table) for mask, table in zip(state, tables))
+
+    def distinct_moves(self, state):
+        """
+        Like moves, but keeps one move from every orbit of the symmetries that fix the state. The moves of an orbit
+        lead to isomorphic positions with the same Nim value, so searching one of them is enough to find the mex.
+
+        Args:
+            state (tuple): The current state.
+
+        Returns:
+            list: List of (kind, element ID, next state) tuples.
+        """
+        moves = self.moves(state)
+        # Checking the vertices first rejects almost every symmetry of an asymmetric position after a few lookups
+        stabilizer = [permutations for permutations, (vertex_tables, edge_tables, hyperedge_tables) in self.symmetries
+                      if permute_mask(state[0], vertex_tables) == state[0] and permute_mask(state[1], edge_tables) == state[1]
+                      and permute_mask(state[2], hyperedge_tables) == state[2]]
+        if not stabilizer:
+            return moves
+        # The stabilizer is a group, so a move is the first of its orbit if no symmetry in it maps it lower
+        kinds = {"vertex": 0, "edge": 1, "hyperedge": 2}
+        return [move for move in moves if all(permutations[kinds[move[0]]][move[1]] >= move[1] for permutations in stabilizer)]
+
+    @classmethod
+    def locate(cls, vertices, edges, hyperedges, cell_size=75, rows=None, cols=None):
+        """
+        Finds the board and state described by the list representation. Positions reached in the game should be
+        located on the size of their board, so they get the same keys as in the game. Without a size, lists whose
+        vertices sit on the centers of grid cells are placed on the smallest nxm grid that contains them: a position
+        that has lost every vertex of its last row or column then gets the key of a smaller board. Anything else
+        becomes a board of its own in its full state.
+
+        Args:
+            vertices (list): List of vertex coordinates.
+            edges (list): List of edges (pairs of vertex indices).
+            hyperedges (list): List of hyperedges (tuples of vertex indices).
+            cell_size (int, optional): The size of a grid cell in pixels. Defaults to 75.
+            rows (int, optional): The number of rows of the board the position is played on.
+            cols (int, optional): The number of columns of the board the position is played on.
+
+        Returns:
+            tuple: The board and the state.
+
+        Raises:
+            ValueError: If rows and cols are given and an element of the lists is not on that board.
+        """
+        if rows is not None and cols is not None:
+            board = cls.grid(rows, cols, cell_size)
+            return board, board.state_from_lists(vertices, edges, hyperedges)
+        if vertices and all((x - cell_size // 2) % cell_size == 0 and (y - cell_size // 2) % cell_size == 0 and x >= 0 and y >= 0 for x, y in vertices):
+            rows = max(y for _, y in vertices) // cell_size + 1
+            cols = max(x for x, _ in vertices) // cell_size + 1
+            board = cls.grid(rows, cols, cell_size)
+            try:
+                return board, board.state_from_lists(vertices, edges, hyperedges)
+            except ValueError:
+                pass
+        board = cls(vertices, edges, hyperedges)
+        return board, board.full_state
+
+    def remove_vertex(self, state, v):
+        """
+        Removes a vertex together with every edge and hyperedge that contains it.
+
+        Args:
+            state (tuple): The current state.
+            v (int): The ID of the vertex.
+
+        Returns:
+            tuple: The new state.
+        """
+        vertex_mask, edge_mask, hyperedge_mask = state
+        return (vertex_mask & ~(1 << v), edge_mask & ~self.vertex_edges[v], hyperedge_mask & ~self.vertex_hyperedges[v])
+
+    def remove_edge(self, state, e):
+        """
+        Removes an edge together with every hyperedge that contains it.
+
+        Args:
+            state (tuple): The current state.
+            e (int): The ID of the edge.
+
+        Returns:
+            tuple: The new state.
+        """
+        vertex_mask, edge_mask, hyperedge_mask = state
+        return (vertex_mask, edge_mask & ~(1 << e), hyperedge_mask & ~self.edge_hyperedges[e])
+
+    def remove_hyperedge(self, state, h):
+        """
+        Removes a hyperedge.
+
+        Args:
+            state (tuple): The current state.
+            h (int): The ID of the hyperedge.
+
+        Returns:
+            tuple: The new state.
+        """
+        vertex_mask, edge_mask, hyperedge_mask = state
+        return (vertex_mask, edge_mask, hyperedge_mask & ~(1 << h))
+
+    def moves(self, state):
+        """
+        Generates every legal move from a state: first the vertices, then the edges, then the hyperedges.
+
+        Args:
+            state (tuple): The current state.
+
+        Returns:
+            list: List of (kind, element ID, next state) tuples where kind is "vertex", "edge" or "hyperedge".
+        """
+        vertex_mask, edge_mask, hyperedge_mask = state
+        vertex_edges, vertex_hyperedges, edge_hyperedges = self.vertex_edges, self.vertex_hyperedges, self.edge_hyperedges
+        moves = []
+        # The same updates as remove_vertex and remove_edge, inlined because this is the innermost loop of the solvers
+        for v in iter_bits(vertex_mask):
+            moves.append(("vertex", v, (vertex_mask & ~(1 << v), edge_mask & ~vertex_edges[v], hyperedge_mask & ~vertex_hyperedges[v])))
+        for e in iter_bits(edge_mask):
+            moves.append(("edge", e, (vertex_mask, edge_mask & ~(1 << e), hyperedge_mask & ~edge_hyperedges[e])))
+        for h in iter_bits(hyperedge_mask):
+            moves.append(("hyperedge", h, (vertex_mask, edge_mask, hyperedge_mask & ~(1 << h))))
+        return moves
+
+    def is_empty(self, state):
+        """
+        Checks if every vertex, edge and hyperedge has been removed.
+
+        Args:
+            state (tuple): The current state.
+
+        Returns:
+            bool: True if nothing is left on the board.
+        """
+        return not any(state)
+
+    def to_lists(self, state):
+        """
+        Converts a state to the list representation used for drawing and saving: the remaining vertices are
+        renumbered from 0 in the order of their IDs.
+
+        Args:
+            state (tuple): The current state.
+
+        Returns:
+            tuple: The lists of vertices, edges and hyperedges.
+        """
+        vertex_mask, edge_mask, hyperedge_mask = state
+        index = {v: i for i, v in enumerate(iter_bits(vertex_mask))}
+        vertices = [self.vertices[v] for v in index]
+        edges = [tuple(index[v] for v in self.edges[e]) for e in iter_bits(edge_mask)]
+        hyperedges = [tuple(index[v] for v in self.hyperedges[h]) for h in iter_bits(hyperedge_mask)]
+        return vertices, edges, hyperedges
+
+    def state_from_lists(self, vertices, edges, hyperedges):
+        """
+        Finds the state of this board described by the list representation, matching vertices by their coordinates.
+
+        Args:
+            vertices (list): List of vertex coordinates.
+            edges (list): List of edges (pairs of vertex indices).
+            hyperedges (list): List of hyperedges (tuples of vertex indices).
+
+        Returns:
+            tuple: The state.
+
+        Raises:
+            ValueError: If an element of the lists is not on this board.
+        """
+        try:
+            ids = [self.vertex_ids[tuple(vertex)] for vertex in vertices]
+            edge_ids = {edge: e for e, edge in enumerate(self.edges)}
+            hyperedge_ids = {hyperedge: h for h, hyperedge in enumerate(self.hyperedges)}
+            vertex_mask = sum(1 << v for v in ids)
+            edge_mask = sum(1 << edge_ids[tuple(ids[v] for v in edge)] for edge in edges)
+            hyperedge_mask = sum(1 << hyperedge_ids[tuple(ids[v] for v in hyperedge)] for hyperedge in hyperedges)
+        except KeyError as error:
+            raise ValueError(f"Element {error} is not on the {self.key} board.") from None
+        return vertex_mask, edge_mask, hyperedge_mask
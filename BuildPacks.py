@@ -0,0 +1,62 @@
+import argparse
+import os
+import sys
+import time
+import GameStates
+import NimStore
+from Board import Board
+
+
+def pack_sizes(max_cells):
+    """
+    The grid sizes with at least two rows and columns and at most max_cells cells, smallest first.
+    """
+    return sorted(((rows, cols) for rows in range(2, max_cells // 2 + 1) for cols in range(2, max_cells // rows + 1)),
+                  key=lambda size: (size[0] * size[1], size))
+
+
+def build_pack(rows, cols, directory):
+    """
+    Solve every position of the nxm grid and write them to <directory>/<rows>x<cols>.tawn.
+
+    Returns:
+        int: Number of positions in the pack.
+    """
+    board = Board.grid(rows, cols)
+    GameStates.board_nim_values.clear()
+    GameStates.calculate_board_nim_value(board, board.full_state)
+    # The solver only searches one move of every symmetric orbit, so add the symmetric images of what it solved:
+    # together they are every position reachable on the grid
+    positions = dict(GameStates.board_nim_values)
+    for (key, state), nim_value in GameStates.board_nim_values.items():
+        for symmetry in board.symmetries:
+            positions.setdefault((key, board.apply_symmetry(symmetry, state)), nim_value)
+    GameStates.board_nim_values.clear()
+    NimStore.save_positions(os.path.join(directory, f"{board.key}.tawn"), positions)
+    return len(positions)
+
+
+def main():
+    """
+    Build the precomputed Nim value packs the game looks positions up in. A pack holds every position reachable on
+    one grid, so any position on that grid is answered without searching.
+    """
+    parser = argparse.ArgumentParser(description="Precompute the Nim values of every position on the standard grids.")
+    parser.add_argument("--max-cells", type=int, default=12, help="largest grid to build, in cells (default: 12, up to 3x4)")
+    parser.add_argument("--directory", default=GameStates.PACK_DIRECTORY, help="where to write the packs")
+    parser.add_argument("--force", action="store_true", help="rebuild packs that already exist")
+    args = parser.parse_args()
+
+    os.makedirs(args.directory, exist_ok=True)
+    for rows, cols in pack_sizes(args.max_cells):
+        filename = os.path.join(args.directory, f"{rows}x{cols}.tawn")
+        if os.path.exists(filename) and not args.force:
+            print(f"{rows}x{cols}: already built", file=sys.stderr)
+            continue
+        start = time.perf_counter()
+        count = build_pack(rows, cols, args.directory)
+        print(f"{rows}x{cols}: {count} positions in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Canonical forms of positions as hypergraphs.
+
+Two positions are isomorphic if their remaining vertices can be relabeled so that their edges and hyperedges match.
+Isomorphic positions have the same Nim value, so a memo keyed by canonical forms stores each of them once, even
+when they sit on different boards or in different places of the same board.
+
+The canonical form is found by colour refinement on the incidence graph of the position (vertices, edges and
+hyperedges as nodes, each element joined to its vertices), followed by individualization: while some vertices share
+a colour, each vertex of the first such cell is given a colour of its own in turn, and the smallest resulting form
+is kept. Automorphisms found along the way prune the vertices that would give the same forms again.
+
+The canonical memo is used by calculate_nim_value and calculate_canonical_nim_value (the recursive solver backend).
+The game, the computer player and the checkpointed search of the Research menu and Solve.py key their memo by board
+position instead (calculate_board_nim_value): a dict lookup there is much cheaper than a canonical form. They still
+read the canonical memo through lookup_nim_value once something has been stored in it.
+"""
+from Board import iter_bits
+
+
+def components(board, state):
+    """
+    Splits a position into its connected components. No move touches two components, so the position is the game
+    sum of them and its Nim value is the XOR of theirs.
+
+    Args:
+        board (Board): The board the position is played on.
+        state (tuple): The state of the position.
+
+    Returns:
+        list: The state of every component.
+    """
+    vertex_mask, edge_mask, hyperedge_mask = state
+    found = []
+    remaining = vertex_mask
+    while remaining:
+        start = remaining & -remaining
+        component_vertices = 0
+        component_edges = 0
+        component_hyperedges = 0
+        frontier = start
+        while frontier:
+            component_vertices |= frontier
+            reached = 0
+            for v in iter_bits(frontier):
+                edges = board.vertex_edges[v] & edge_mask & ~component_edges
+                hyperedges = board.vertex_hyperedges[v] & hyperedge_mask & ~component_hyperedges
+                component_edges |= edges
+                component_hyperedges |= hyperedges
+                for e in iter_bits(edges):
+                    v1, v2 = board.edges[e]
+                    reached |= (1 << v1) | (1 << v2)
+                for h in iter_bits(hyperedges):
+                    for u in board.hyperedges[h]:
+                        reached |= 1 << u
+            frontier = reached & vertex_mask & ~component_vertices
+        remaining &= ~component_vertices
+        found.append((component_vertices, component_edges, component_hyperedges))
+    return found
+
+
+def refine(colours, neighbours):
+    """
+    Colour refinement: repeatedly recolour every node by its colour and the multiset of its neighbours' colours
+    until no colour class splits. Colours are ranks, so equal inputs always give equal outputs.
+    """
+    count = len(set(colours))
+    while True:
+        signatures = [(colour, tuple(sorted(map(colours.__getitem__, nodes)))) for colour, nodes in zip(colours, neighbours)]
+        ranks = {signature: rank for rank, signature in enumerate(sorted(set(signatures)))}
+        colours = [ranks[signature] for signature in signatures]
+        if len(ranks) == count:
+            return colours
+        count = len(ranks)
+
+
+def canonical_form(board, state):
+    """
+    The canonical form of a position: equal for two positions exactly when they are isomorphic as hypergraphs.
+
+    Args:
+        board (Board): The board the position is played on.
+        state (tuple): The state of the position.
+
+    Returns:
+        tuple: (number of vertices, edges, hyperedges) with the vertices relabeled canonically and the edges and
+        hyperedges as sorted tuples of vertex labels.
+    """
+    vertex_mask, edge_mask, hyperedge_mask = state
+    vertices = list(iter_bits(vertex_mask))
+    index = {v: i for i, v in enumerate(vertices)}
+    # Every element is (1, vertices) for an edge or (2, vertices) for a hyperedge
+    elements = [(1, tuple(index[v] for v in board.edges[e])) for e in iter_bits(edge_mask)]
+    elements += [(2, tuple(index[v] for v in board.hyperedges[h])) for h in iter_bits(hyperedge_mask)]
+    return canonical_labeling(len(vertices), elements)
+
+
+def graph_canonical_form(n, edges):
+    """
+    The canonical form of a plain graph, in the same format as canonical_form. Without hyperedges the refinement runs
+    on the graph itself instead of its incidence graph, which has a node for every edge as well.
+
+    Args:
+        n (int): The number of vertices.
+        edges (list): The edges as pairs of vertices 0..n-1.
+
+    Returns:
+        tuple: (n, edges, ()) with the vertices relabeled canonically.
+    """
+    neighbours = [[] for _ in range(n)]
+    for u, v in edges:
+        neighbours[u].append(v)
+        neighbours[v].append(u)
+    return search(n, [(1, tuple(edge)) for edge in edges], refine([0] * n, neighbours), neighbours)
+
+
+def canonical_labeling(n, elements):
+    """
+    The canonical form of n vertices and a list of (kind, vertices) elements, kind 1 for edges and 2 for hyperedges.
+    """
+    # Nodes 0..n-1 are the vertices and the rest are the edges and hyperedges, coloured apart by their kind
+    neighbours = [[] for _ in range(n)] + [list(element) for _, element in elements]
+    for i, (_, element) in enumerate(elements):
+        for v in element:
+            neighbours[v].append(n + i)
+    colours = refine([0] * n + [kind for kind, _ in elements], neighbours)
+    return search(n, elements, colours, neighbours)
+
+
+def search(n, elements, colours, neighbours):
+    """
+    Individualization: the smallest form over every way of splitting the first vertex colour class that is not a
+    single vertex.
+
+    Two leaves with the same form give an automorphism of the position, which fixes the vertices individualized on
+    the way to both. Leaves are compared with the first leaf and the best one so far. On a match, the search goes
+    back to where the two paths split, because the branch it was in gives the same forms as the one already searched.
+    A vertex that an automorphism fixing the current path maps onto an already tried vertex is skipped. Without this
+    pruning, positions with many symmetries (such as n isolated vertices, with n! leaves) take exponential time.
+    """
+    automorphisms = []
+    # (form, labels, path) of the first leaf and of the smallest form so far
+    leaves = {}
+
+    def explore(colours, path):
+        # Returns the depth to go back to after finding an automorphism, or None
+        cells = {}
+        for v in range(n):
+            cells.setdefault(colours[v], []).append(v)
+        cell = next((cells[colour] for colour in sorted(cells) if len(cells[colour]) > 1), None)
+        if cell is None:
+            labels = labeling(n, colours)
+            leaf = (form(n, elements, labels), labels, path)
+            for other in (leaves.get('first'), leaves.get('best')):
+                if other is not None and other[0] == leaf[0]:
+                    # Map every vertex to the vertex with its label in this leaf
+                    vertex_of = {label: v for v, label in enumerate(labels)}
+                    automorphisms.append([vertex_of[label] for label in other[1]])
+                    return next((depth for depth, (u, v) in enumerate(zip(other[2], path)) if u != v), len(path))
+            leaves.setdefault('first', leaf)
+            if 'best' not in leaves or leaf[0] < leaves['best'][0]:
+                leaves['best'] = leaf
+            return None
+        tried = []
+        for v in cell:
+            if tried and orbit(v, path, automorphisms) & set(tried):
+                continue
+            tried.append(v)
+            # A new colour just below the cell's keeps the other colours in the same order
+            split = [2 * colour + 1 for colour in colours]
+            split[v] -= 1
+            depth = explore(refine(split, neighbours), path + (v,))
+            if depth is not None and depth < len(path):
+                return depth
+        return None
+
+    explore(colours, ())
+    return leaves['best'][0]
+
+
+def orbit(v, path, automorphisms):
+    """
+    The vertices that the automorphisms fixing every vertex of path map v to, repeatedly.
+    """
+    fixing = [automorphism for automorphism in automorphisms if all(automorphism[u] == u for u in path)]
+    found = {v}
+    frontier = [v]
+    while frontier:
+        u = frontier.pop()
+        for automorphism in fixing:
+            if automorphism[u] not in found:
+                found.add(automorphism[u])
+                frontier.append(automorphism[u])
+    return found
+
+
+def labeling(n, colours):
+    """
+    The labels of the vertices of a position whose vertices all have different colours: their rank in colour order.
+    """
+    labels = [0] * n
+    for rank, v in enumerate(sorted(range(n), key=lambda v: colours[v])):
+        labels[v] = rank
+    return labels
+
+
+def form(n, elements, labels):
+    """
+    The form of a position with its vertices relabeled.
+    """
+    relabeled = sorted((kind, tuple(sorted(labels[v] for v in element))) for kind, element in elements)
+    return (n, tuple(element for kind, element in relabeled if kind == 1), tuple(element for kind, element in relabeled if kind == 2))
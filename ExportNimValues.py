@@ -0,0 +1,121 @@
+import argparse
+import csv
+import json
+import sys
+import GameStates
+import NimStore
+from Board import encode_state, grid_size
+
+# The columns of every exported row
+FIELDS = ['board', 'rows', 'cols', 'state', 'nim_value', 'moves']
+
+
+def read_positions(filename):
+    """
+    Yields (board key, state, Nim value) for every position stored in a game states table written by
+    GameStates.save_game_states_to_file or a checkpoint written by GameStates.save_checkpoint (also a positions
+    table, followed by its segments). The Nim value is None if it was not calculated. The table is read in chunks,
+    so memory use does not grow with its size. Legacy game_states.pkl files are converted to tables with
+    MergeNimTables.py first.
+
+    Raises:
+        NimStore.NimStoreError: If the file is not a positions table.
+    """
+    for table in GameStates.checkpoint_tables(filename):
+        for (key, state), nim_value in NimStore.iter_positions(table):
+            yield key, state, nim_value
+
+
+def to_rows(positions):
+    """
+    Turns (board key, state, Nim value) tuples into export rows. Every remaining vertex, edge and hyperedge can be
+    removed, so the number of moves is the number of set bits in the state.
+    """
+    for key, state, nim_value in positions:
+        rows, cols = grid_size(key)
+        yield {
+            'board': key,
+            'rows': rows,
+            'cols': cols,
+            'state': encode_state(state),
+            'nim_value': nim_value,
+            'moves': sum(mask.bit_count() for mask in state)
+        }
+
+
+def deduplicate(rows):
+    """
+    Drops repeated positions, keeping the first row of each. Only the keys of the positions seen so far are kept in
+    memory.
+    """
+    seen = set()
+    for row in rows:
+        key = (row['board'], row['state'])
+        if key not in seen:
+            seen.add(key)
+            yield row
+
+
+def write_csv(rows, f):
+    writer = csv.DictWriter(f, fieldnames=FIELDS)
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow({field: '' if row[field] is None else row[field] for field in FIELDS})
+        count += 1
+    return count
+
+
+def write_jsonl(rows, f):
+    count = 0
+    for row in rows:
+        f.write(json.dumps(row) + "\n")
+        count += 1
+    return count
+
+
+WRITERS = {'csv': write_csv, 'jsonl': write_jsonl}
+
+
+def export(filenames, output, fmt=None, unique=False):
+    """
+    Export the positions stored in game states and checkpoint files, one row per position, as CSV or JSON Lines.
+    The rows flow through generators from the files to the output, so only the file being read is held in memory.
+
+    Args:
+        filenames (list): The files to export.
+        output (str): The output file, or "-" for standard output.
+        fmt (str, optional): "csv" or "jsonl". Defaults to the extension of the output file.
+        unique (bool, optional): Drop positions that appear in several files. This keeps the key of every position in
+            memory. Defaults to False.
+
+    Returns:
+        int: Number of rows written.
+    """
+    if fmt is None:
+        fmt = 'jsonl' if output.endswith(('.jsonl', '.json')) else 'csv'
+    rows = (row for filename in filenames for row in to_rows(read_positions(filename)))
+    if unique:
+        rows = deduplicate(rows)
+    if output == '-':
+        return WRITERS[fmt](rows, sys.stdout)
+    with open(output, 'w', newline='') as f:
+        return WRITERS[fmt](rows, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export collected Nim values to CSV or JSON Lines.")
+    parser.add_argument("files", nargs="*", default=["game_states.tawn"], help="game states or checkpoint files")
+    parser.add_argument("-o", "--output", default="nim_values.csv", help="output file, or - for standard output")
+    parser.add_argument("--format", choices=sorted(WRITERS), help="output format (default: from the extension)")
+    parser.add_argument("--unique", action="store_true", help="drop positions repeated across files")
+    args = parser.parse_args()
+    legacy = [filename for filename in args.files if not filename.endswith('.tawn')]
+    if legacy:
+        parser.error(f"{legacy[0]} is not a .tawn table; convert it first with: python MergeNimTables.py {legacy[0]} -o game_states.tawn")
+    count = export(args.files, args.output, args.format, args.unique)
+    print(f"Exported {count} positions to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
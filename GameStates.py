@@ -1,26 +1,156 @@
+import glob
+import itertools
+import json
 import os
 import pickle
+import threading
+import time
+import numpy as np
+import Canonical
+import NimStore
+from Board import Board, iter_bits
+
+# The version of the current_game_state.json layout
+CURRENT_GAME_VERSION = 1
+# The version of the checkpoint layout written by save_checkpoint. Version 2 frames hold one move per symmetry orbit;
+# version 3 checkpoints are NimStore tables instead of pickles; version 4 checkpoints write the Nim values added
+# since the last checkpoint to segments.
+CHECKPOINT_VERSION = 4
 
 game_states = {}
+# Guards game_states while it is loaded in the background (see load_game_states_from_file)
+game_states_lock = threading.Lock()
+game_states_loaded = threading.Event()
+game_states_loaded.set()
+game_states_error = None
+# Nim values of plain graphs (positions without hyperedges) by graph_key. This table is shared by the Tripartite
+# Graphs calculator and by every hypergraph endgame once its hyperedges are gone.
 nim_values = {}
+# The second level of the graph table, by graph_invariants: a bucket is {'graphs': [(key, nim value)], 'forms': None}
+# until a graph that is not in nim_values gets the same invariants. Only then are the graphs in it canonicalized
+# ('forms' becomes {canonical form: nim value}), so graphs with unique invariants are never canonicalized.
+graph_buckets = {}
+board_nim_values = {}
+# Nim values of connected positions by their canonical form (see Canonical.py), shared by every isomorphic position.
+# Only calculate_canonical_nim_value fills it. calculate_board_nim_value does not look in it, but lookup_nim_value does.
+canonical_nim_values = {}
+# Outcomes found by is_winning_position (True if the player to move wins), by position_key and, for connected
+# positions, by canonical form
+winning_positions = {}
+canonical_winning_positions = {}
+
+# The checkpoints written by this process, by file: (number of the next segment, number of board_nim_values entries
+# already written, or None before the first write). See save_checkpoint.
+checkpoint_progress = {}
+
+# Precomputed tables of every position of a board, built by BuildPacks.py, named <board key>.tawn
+PACK_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'packs')
+# The opened packs by board key, None for boards without one
+packs = {}
+# Set to False to always solve, for example when timing the solvers
+use_packs = True
+# The SolverStats counting the positions the solvers expand, set by SolverStats.enable_instrumentation. None when
+# instrumentation is off.
+stats = None
 
 def get_possible_moves(vertices, edges, hyperedges):
-    possible_moves = []
-    for i, vertex in enumerate(vertices):
-        new_vertices = vertices[:i] + vertices[i+1:]
-        new_edges = [edge for edge in edges if i not in edge]
-        new_hyperedges = [hyperedge for hyperedge in hyperedges if i not in hyperedge]
-        possible_moves.append((new_vertices, new_edges, new_hyperedges))
-    for edge in edges:
-        new_edges = edges[:]
-        new_edges.remove(edge)
-        new_hyperedges = [hyperedge for hyperedge in hyperedges if not (edge[0] in hyperedge and edge[1] in hyperedge)]
-        possible_moves.append((vertices, new_edges, new_hyperedges))
-    for hyperedge in hyperedges:
-        new_hyperedges = hyperedges[:]
-        new_hyperedges.remove(hyperedge)
-        possible_moves.append((vertices, edges, new_hyperedges))
-    return possible_moves
+    """
+    Generate all possible next states of a position given as lists. The moves come from Board.moves, the same engine
+    used by the game and the solver, so removed vertices are renumbered exactly like in the game.
+
+    Args:
+        vertices (list): List of vertex coordinates.
+        edges (list): List of edges (pairs of vertex indices).
+        hyperedges (list): List of hyperedges (sets of vertex indices).
+
+    Returns:
+        list: List of possible next states as (vertices, edges, hyperedges) lists.
+    """
+    board, state = Board.locate(vertices, edges, hyperedges)
+    return [board.to_lists(next_state) for _, _, next_state in board.moves(state)]
+
+def position_key(board, state):
+    """
+    The key a position is stored under in board_nim_values and game_states.
+
+    Args:
+        board (Board): The board the position is played on.
+        state (tuple): The (vertex_mask, edge_mask, hyperedge_mask) state of the position.
+
+    Returns:
+        tuple: The key of the position.
+    """
+    # The state is three Python ints, so hashing the key costs the same for every move however many elements it
+    # removes, and the dict compares the whole state on a hash match. Incremental (Zobrist) hashes were measured
+    # slower here: XOR-ing element keys in Python costs more than hashing the tuple in C.
+    return (board.key, state)
+
+def lookup_nim_value(board, state, canonical=True):
+    """
+    Look up the Nim value of a position without calculating it, in board_nim_values or in the precomputed pack of
+    its board.
+
+    Args:
+        board (Board): The board the position is played on.
+        state (tuple): The state of the position.
+        canonical (bool, optional): Also look in the memos keyed by canonical form, which costs a canonical form
+            once something has been stored in them. Defaults to True.
+
+    Returns:
+        int: The Nim value, or None if it has not been calculated yet.
+    """
+    key = position_key(board, state)
+    nim_value = board_nim_values.get(key)
+    if nim_value is None:
+        pack = get_pack(board)
+        if pack is not None:
+            nim_value = pack.get(key)
+    # Canonical forms cost far more than a dict lookup, so only look when something has been stored under them
+    if nim_value is None and canonical and (canonical_nim_values or nim_values):
+        nim_value = lookup_canonical_nim_value(board, state)
+    return nim_value
+
+def lookup_canonical_nim_value(board, state):
+    """
+    Look up the Nim value of a position in canonical_nim_values, or in nim_values for the components without
+    hyperedges: the XOR of the values of its components.
+
+    Args:
+        board (Board): The board the position is played on.
+        state (tuple): The state of the position.
+
+    Returns:
+        int: The Nim value, or None if some component has not been calculated yet.
+    """
+    if not state[2]:
+        return lookup_graph_nim_value(*board_graph(board, state))
+    nim_value = 0
+    for component in Canonical.components(board, state):
+        if not component[2]:
+            component_value = lookup_graph_nim_value(*board_graph(board, component))
+        else:
+            component_value = canonical_nim_values.get(Canonical.canonical_form(board, component))
+        if component_value is None:
+            return None
+        nim_value ^= component_value
+    return nim_value
+
+def get_pack(board):
+    """
+    The precomputed pack of a board, opened the first time it is needed.
+
+    Args:
+        board (Board): The board.
+
+    Returns:
+        NimStore.PositionTable: The pack, or None if there is no pack for the board.
+    """
+    if not use_packs:
+        return None
+    if board.key not in packs:
+        filename = os.path.join(PACK_DIRECTORY, f"{board.key}.tawn")
+        packs[board.key] = NimStore.PositionTable(filename) if os.path.exists(filename) else None
+    return packs[board.key]
 
 def calculate_nim_value(vertices, edges, hyperedges):
     """
@@ -38,16 +168,560 @@ def calculate_nim_value(vertices, edges, hyperedges):
     if not hyperedges:
         return calculate_nim_value_without_hyperedges(vertices, edges)
 
-    state = (tuple(vertices), tuple(map(tuple, edges)), tuple(map(tuple, hyperedges)))
-    if state in nim_values:
-        return nim_values[state]
+    # Solve on the same board and state the game uses, so the values are shared with in-game lookups
+    board, state = Board.locate(vertices, edges, hyperedges)
+    nim_value = lookup_nim_value(board, state)
+    if nim_value is not None:
+        return nim_value
+    return calculate_canonical_nim_value(board, state)
+
+def calculate_board_nim_value(board, state):
+    """
+    Calculate the Nim value (Grundy number) of a position on a Board directly from its bitmask state.
+
+    Args:
+        board (Board): The board the position is played on.
+        state (tuple): The (vertex_mask, edge_mask, hyperedge_mask) state of the position.
+
+    Returns:
+        int: The Nim value of the position.
+    """
+    key = position_key(board, state)
+    nim_value = board_nim_values.get(key)
+    if nim_value is not None:
+        return nim_value
+
+    if stats is not None:
+        stats.expand()
+    # Symmetric moves lead to positions with the same Nim value, so one move per orbit is enough for the mex
+    nim_value = mex([calculate_board_nim_value(board, next_state) for _, _, next_state in board.distinct_moves(state)])
+    board_nim_values[key] = nim_value
+    return nim_value
+
+def calculate_canonical_nim_value(board, state):
+    """
+    Calculate the Nim value of a position, sharing the work between isomorphic positions.
+
+    A position whose vertices fall apart into several connected components is the game sum of them, so its Nim value
+    is the XOR of theirs. A connected position is memoized in canonical_nim_values under its canonical form, so every
+    position isomorphic to it, on this board or any other, is solved once. Canonical forms are expensive, so every
+    position is also memoized in board_nim_values under its own key and only canonicalized the first time. Positions
+    without hyperedges are plain graphs and are solved by calculate_graph_nim_value, sharing nim_values with the
+    Tripartite Graphs calculator.
 
-    next_states = get_possible_moves(vertices, edges, hyperedges)
-    next_nim_values = [calculate_nim_value(*next_state) for next_state in next_states]
-    nim_value = mex(next_nim_values)
-    nim_values[state] = nim_value
+    Args:
+        board (Board): The board the position is played on.
+        state (tuple): The (vertex_mask, edge_mask, hyperedge_mask) state of the position.
+
+    Returns:
+        int: The Nim value of the position.
+    """
+    key = position_key(board, state)
+    nim_value = board_nim_values.get(key)
+    if nim_value is not None:
+        return nim_value
+
+    # Once the hyperedges are gone the position is a plain graph, solved with the graph table
+    if not state[2]:
+        nim_value = calculate_graph_nim_value(*board_graph(board, state))
+        board_nim_values[key] = nim_value
+        return nim_value
+
+    components = Canonical.components(board, state)
+    if len(components) == 1:
+        form = Canonical.canonical_form(board, state)
+        nim_value = canonical_nim_values.get(form)
+        if nim_value is None:
+            if stats is not None:
+                stats.expand()
+            nim_value = mex([calculate_canonical_nim_value(board, next_state) for _, _, next_state in board.distinct_moves(state)])
+            canonical_nim_values[form] = nim_value
+    else:
+        nim_value = 0
+        for component in components:
+            nim_value ^= calculate_canonical_nim_value(board, component)
+    board_nim_values[key] = nim_value
     return nim_value
 
+def is_winning_position(board, state):
+    """
+    Decide whether the player to move wins (an N-position) without calculating the full Nim value. A position is
+    winning as soon as one move leads to a losing position, so the remaining moves are never explored. Known Nim
+    values are reused, from the memo, the packs and canonical_nim_values.
+
+    Results are stored in winning_positions under position_key. Connected positions are also stored in
+    canonical_winning_positions under their canonical form, so isomorphic positions are decided once. A position
+    that falls apart into components is searched as a whole: the outcome of a game sum depends on the Nim values of
+    its components, not only on their outcomes.
+
+    Args:
+        board (Board): The board the position is played on.
+        state (tuple): The state of the position.
+
+    Returns:
+        bool: True if the player to move wins, False if the previous player wins.
+    """
+    key = position_key(board, state)
+    winning = winning_positions.get(key)
+    if winning is not None:
+        return winning
+    nim_value = lookup_nim_value(board, state, canonical=False)
+    if nim_value is not None:
+        return nim_value != 0
+
+    form = None
+    if len(Canonical.components(board, state)) == 1:
+        form = Canonical.canonical_form(board, state)
+        winning = canonical_winning_positions.get(form)
+        if winning is None and form in canonical_nim_values:
+            winning = canonical_nim_values[form] != 0
+    if winning is None:
+        winning = any(not is_winning_position(board, next_state) for _, _, next_state in board.distinct_moves(state))
+        if form is not None:
+            canonical_winning_positions[form] = winning
+    winning_positions[key] = winning
+    return winning
+
+class SearchBudgetExceeded(Exception):
+    """
+    Raised when an anytime search runs out of time or nodes.
+    """
+
+
+class SearchBudget:
+    """
+    A wall-clock and/or node budget for an anytime search, which a CancellationToken can also end early.
+    """
+    __slots__ = ('deadline', 'nodes_left', 'nodes', 'cancel')
+
+    def __init__(self, time_budget=None, node_budget=None, cancel=None):
+        """
+        Args:
+            time_budget (float, optional): Seconds the search may run. Defaults to no limit.
+            node_budget (int, optional): Number of positions the search may expand. Defaults to no limit.
+            cancel (CancellationToken, optional): Ends the budget once cancelled. Defaults to None.
+        """
+        self.deadline = None if time_budget is None else time.perf_counter() + time_budget
+        self.nodes_left = node_budget
+        self.nodes = 0
+        self.cancel = cancel
+
+    def spend(self):
+        """
+        Account for one expanded position.
+
+        Raises:
+            SearchBudgetExceeded: If the budget has run out.
+        """
+        self.nodes += 1
+        if self.nodes_left is not None:
+            self.nodes_left -= 1
+            if self.nodes_left < 0:
+                raise SearchBudgetExceeded
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchBudgetExceeded
+        if self.cancel is not None and self.cancel.cancelled:
+            raise SearchBudgetExceeded
+
+
+class SearchResult:
+    """
+    What an anytime search found out about a position.
+
+    Attributes:
+        nim_value (int): The exact Nim value, or None if the search ran out of budget first.
+        outcome (str): "P" if the previous player wins (Nim value 0), "N" if the next player wins, or None if neither
+            could be proven.
+        moves (list): List of ((kind, element ID, next state), Nim value) pairs for every move. The Nim value is None
+            for moves whose position could not be solved.
+        nodes (int): Number of positions expanded by the search.
+        elapsed (float): Seconds spent searching.
+    """
+    __slots__ = ('nim_value', 'outcome', 'moves', 'nodes', 'elapsed')
+
+    def __init__(self, nim_value, outcome, moves, nodes, elapsed):
+        self.nim_value = nim_value
+        self.outcome = outcome
+        self.moves = moves
+        self.nodes = nodes
+        self.elapsed = elapsed
+
+    @property
+    def exact(self):
+        return self.nim_value is not None
+
+    @property
+    def confidence(self):
+        """
+        The fraction of moves whose position was solved exactly (1.0 once the Nim value is known).
+        """
+        if self.exact or not self.moves:
+            return 1.0
+        return sum(nim_value is not None for _, nim_value in self.moves) / len(self.moves)
+
+    @property
+    def winning_moves(self):
+        """
+        The moves proven to lead to a position with Nim value 0.
+        """
+        return [move for move, nim_value in self.moves if nim_value == 0]
+
+    def __repr__(self):
+        return f"SearchResult(nim_value={self.nim_value}, outcome={self.outcome}, confidence={self.confidence:.2f}, nodes={self.nodes}, elapsed={self.elapsed:.3f})"
+
+
+def calculate_board_nim_value_within(board, state, budget):
+    """
+    Calculate the Nim value of a position unless the budget runs out first. Only completely solved positions are
+    stored in board_nim_values, so an interrupted search never leaves wrong values behind.
+
+    Args:
+        board (Board): The board the position is played on.
+        state (tuple): The state of the position.
+        budget (SearchBudget): The budget to spend.
+
+    Returns:
+        int: The Nim value of the position.
+
+    Raises:
+        SearchBudgetExceeded: If the budget runs out before the position is solved.
+    """
+    key = position_key(board, state)
+    nim_value = board_nim_values.get(key)
+    if nim_value is not None:
+        return nim_value
+    budget.spend()
+    if stats is not None:
+        stats.expand()
+
+    nim_value = mex([calculate_board_nim_value_within(board, next_state, budget) for _, _, next_state in board.distinct_moves(state)])
+    board_nim_values[key] = nim_value
+    return nim_value
+
+
+def calculate_nim_value_anytime(board, state, time_budget=None, node_budget=None, cancel=None):
+    """
+    Search a position for at most the given time and number of expanded positions, and report everything that was
+    proven when the budget ran out. The moves are solved one at a time, smallest position first: any move to a
+    position with Nim value 0 proves an N-position, and solving all of them gives the exact Nim value.
+
+    Args:
+        board (Board): The board the position is played on.
+        state (tuple): The state of the position.
+        time_budget (float, optional): Seconds the search may run. Defaults to no limit.
+        node_budget (int, optional): Number of positions the search may expand. Defaults to no limit.
+        cancel (CancellationToken, optional): Ends the search like a spent budget once cancelled, for example from
+            another thread. Defaults to None.
+
+    Returns:
+        SearchResult: The exact Nim value if it was found, the P/N outcome if it was proven, and the Nim value of
+        every solved move.
+    """
+    start = time.perf_counter()
+    budget = SearchBudget(time_budget, node_budget, cancel)
+    moves = board.moves(state)
+    # Only the dict and pack lookups run before the budget is checked: a canonical form for every move could take
+    # longer than the whole budget
+    move_values = {move: lookup_nim_value(board, move[2], canonical=False) for move in moves}
+
+    # Smaller positions are cheaper to solve, so try them first
+    for move in sorted(moves, key=lambda move: sum(mask.bit_count() for mask in move[2])):
+        if move_values[move] is not None:
+            continue
+        try:
+            move_values[move] = calculate_board_nim_value_within(board, move[2], budget)
+        except SearchBudgetExceeded:
+            break
+
+    child_values = [move_values[move] for move in moves]
+    if None not in child_values:
+        nim_value = mex(child_values)
+        board_nim_values[position_key(board, state)] = nim_value
+        outcome = "P" if nim_value == 0 else "N"
+    else:
+        nim_value = None
+        outcome = "N" if 0 in child_values else None
+    return SearchResult(nim_value, outcome, [(move, move_values[move]) for move in moves], budget.nodes, time.perf_counter() - start)
+
+class SolveCancelled(Exception):
+    """
+    Raised when a solve is stopped through its CancellationToken.
+    """
+
+
+class CancellationToken:
+    """
+    Lets another thread (or a progress callback) stop a running solve.
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+
+    def cancel(self):
+        self.event.set()
+
+    @property
+    def cancelled(self):
+        return self.event.is_set()
+
+
+def calculate_nim_value_with_progress(board, state, progress=None, cancel=None, report_every=1000, checkpoint=None, checkpoint_every=300.0):
+    """
+    Calculate the Nim value of a position like calculate_board_nim_value, reporting progress and stopping when asked.
+
+    The search keeps its own stack instead of recursing, so it can stop between any two positions. A value is only
+    written to board_nim_values once its position is completely solved, so a cancelled solve leaves the memo correct
+    and a later solve continues from everything that was finished.
+
+    Args:
+        board (Board): The board the position is played on.
+        state (tuple): The state of the position.
+        progress (function, optional): Called as progress(solved, remaining, elapsed) every report_every solved
+            positions, where remaining is the upper bound 2^(V+E+H) on the positions below the root minus the ones
+            solved so far.
+        cancel (CancellationToken, optional): Stops the solve once cancelled.
+        report_every (int, optional): Number of solved positions between progress reports and cancellation checks.
+            Defaults to 1000.
+        checkpoint (str, optional): File to write checkpoints to (see save_checkpoint). Defaults to no checkpoints.
+        checkpoint_every (float, optional): Seconds between checkpoints. Defaults to 300.
+
+    Returns:
+        int: The Nim value of the position.
+
+    Raises:
+        SolveCancelled: If the token was cancelled before the position was solved.
+    """
+    nim_value = lookup_nim_value(board, state)
+    if nim_value is not None:
+        return nim_value
+    return run_solver_stack(board, [new_solver_frame(board, state)], progress, cancel, report_every, checkpoint, checkpoint_every)
+
+def new_solver_frame(board, state):
+    """
+    A frame of the solver stack: [state, key, next states, Nim values of the next states solved so far]. The next
+    state to solve is always next_states[len(values)], so a frame is consistent wherever the solve is interrupted.
+    """
+    return [state, position_key(board, state), [next_state for _, _, next_state in board.distinct_moves(state)], []]
+
+# Returned by board_nim_values.get for positions that have not been solved, so one lookup finds either
+MISSING = object()
+
+def run_solver_stack(board, stack, progress=None, cancel=None, report_every=1000, checkpoint=None, checkpoint_every=300.0):
+    """
+    Solve the positions on a solver stack, from the top down to the root at the bottom. See
+    calculate_nim_value_with_progress for the arguments.
+
+    Returns:
+        int: The Nim value of the root position.
+    """
+    root_state, root_key = stack[0][0], stack[0][1]
+    start = last_checkpoint = time.perf_counter()
+    upper_bound = 2 ** sum(mask.bit_count() for mask in root_state)
+    solved = 0
+    try:
+        while stack:
+            frame = stack[-1]
+            next_states, values = frame[2], frame[3]
+            if len(values) < len(next_states):
+                next_state = next_states[len(values)]
+                nim_value = board_nim_values.get(position_key(board, next_state), MISSING)
+                if nim_value is MISSING:
+                    stack.append(new_solver_frame(board, next_state))
+                else:
+                    values.append(nim_value)
+                continue
+
+            if stats is not None:
+                stats.expand(len(stack) - 1)
+            nim_value = mex(values)
+            board_nim_values[frame[1]] = nim_value
+            stack.pop()
+            if stack:
+                stack[-1][3].append(nim_value)
+
+            solved += 1
+            if solved % report_every == 0:
+                if progress is not None:
+                    progress(solved, max(upper_bound - solved, 0), time.perf_counter() - start)
+                if cancel is not None and cancel.cancelled:
+                    raise SolveCancelled
+                if checkpoint is not None and time.perf_counter() - last_checkpoint > checkpoint_every:
+                    save_checkpoint(checkpoint, board, root_state, stack)
+                    last_checkpoint = time.perf_counter()
+    except (SolveCancelled, KeyboardInterrupt):
+        if checkpoint is not None:
+            save_checkpoint(checkpoint, board, root_state, stack)
+        raise
+    if checkpoint is not None:
+        save_checkpoint(checkpoint, board, root_state, stack)
+    return board_nim_values[root_key]
+
+def checkpoint_segment(filename, number):
+    """
+    The file of a checkpoint segment: the Nim values added to the memo between two checkpoints.
+    """
+    return f"{filename}.{number}"
+
+def remove_checkpoint(filename):
+    """
+    Delete a checkpoint written by save_checkpoint with all its segments.
+
+    Args:
+        filename (str): The checkpoint file.
+    """
+    checkpoint_progress.pop(filename, None)
+    if os.path.exists(filename):
+        os.remove(filename)
+    remove_checkpoint_segments(filename)
+
+def remove_checkpoint_segments(filename):
+    for path in glob.glob(glob.escape(filename) + '.*'):
+        if path[len(filename) + 1:].isdigit():
+            os.remove(path)
+
+def save_checkpoint(filename, board, root_state, stack, compact=False):
+    """
+    Atomically write the memo and the work stack of a solve to a file. The memo is stored as NimStore positions
+    tables, with the board, the root state and the stack in their metadata, so loading a checkpoint never runs code
+    from the file. NimStore writes every table under a temporary name and renames it over the old one, so an
+    interruption while writing never leaves a broken checkpoint behind.
+
+    Only the first checkpoint of a solve writes the whole memo, to the checkpoint file itself. Every later one
+    writes the Nim values added since the one before (the memo is a dict, so they are the last entries in insertion
+    order) to a new segment file next to it, "<checkpoint>.<number>". load_checkpoint reads the segments after the
+    checkpoint file, and the stack of the last one.
+
+    Args:
+        filename (str): The checkpoint file.
+        board (Board): The board being solved.
+        root_state (tuple): The state the solve started from.
+        stack (list): The solver stack; empty once the solve is finished.
+        compact (bool, optional): Write the whole memo to the checkpoint file and delete the segments, as when
+            resuming. Defaults to False.
+    """
+    checkpoint = {
+        'version': CHECKPOINT_VERSION,
+        'board': NimStore.board_meta(board),
+        'root_state': list(root_state),
+        'stack': [[list(frame[0]), frame[3]] for frame in stack]
+    }
+    next_segment, written = checkpoint_progress.get(filename, (1, None))
+    if compact or written is None or written > len(board_nim_values) or not os.path.exists(filename):
+        # The segments are numbered on from the ones replaced, so one left over by an interrupted compaction is
+        # never read as a new one
+        checkpoint['next_segment'] = next_segment
+        NimStore.save_positions(filename, board_nim_values, {'checkpoint': checkpoint})
+        remove_checkpoint_segments(filename)
+    else:
+        checkpoint['segment'] = next_segment
+        added = dict(itertools.islice(board_nim_values.items(), written, None))
+        NimStore.save_positions(checkpoint_segment(filename, next_segment), added, {'checkpoint': checkpoint})
+        next_segment += 1
+    checkpoint_progress[filename] = (next_segment, len(board_nim_values))
+
+def read_checkpoint_meta(filename, board=None, root_state=None):
+    """
+    The checkpoint metadata of a checkpoint file or segment, checked against the board and root state of the
+    checkpoint it belongs to.
+
+    Raises:
+        NimStore.NimStoreError: If the file is not a valid checkpoint.
+    """
+    _, meta, _, _, _ = NimStore.read_header(filename)
+    checkpoint = meta.get('checkpoint')
+    if not isinstance(checkpoint, dict) or checkpoint.get('version') != CHECKPOINT_VERSION:
+        raise NimStore.NimStoreError(f"{filename} is not a checkpoint of this version.")
+    if board is not None and (checkpoint.get('board') != NimStore.board_meta(board) or checkpoint.get('root_state') != list(root_state)):
+        raise NimStore.NimStoreError(f"{filename} belongs to another solve.")
+    return checkpoint
+
+def checkpoint_tables(filename):
+    """
+    The tables holding the Nim values of a checkpoint: the checkpoint file and its segments, in the order they were
+    written. Any other positions table is returned alone.
+
+    Args:
+        filename (str): The checkpoint file.
+
+    Returns:
+        list: The file names.
+    """
+    _, meta, _, _, _ = NimStore.read_header(filename)
+    checkpoint = meta.get('checkpoint')
+    tables = [filename]
+    if isinstance(checkpoint, dict) and type(checkpoint.get('next_segment', 1)) is int:
+        number = checkpoint.get('next_segment', 1)
+        while os.path.exists(checkpoint_segment(filename, number)):
+            tables.append(checkpoint_segment(filename, number))
+            number += 1
+    return tables
+
+def load_checkpoint(filename):
+    """
+    Load a checkpoint written by save_checkpoint, adding the Nim values of the checkpoint file and its segments to
+    board_nim_values.
+
+    Args:
+        filename (str): The checkpoint file.
+
+    Returns:
+        tuple: The board, the root state and the rebuilt solver stack.
+
+    Raises:
+        NimStore.NimStoreError: If the file is not a valid checkpoint.
+    """
+    checkpoint = read_checkpoint_meta(filename)
+    # Grid checkpoints are resumed on the shared grid board, which knows its symmetries
+    board = NimStore.boards_from_meta(filename, {'boards': [checkpoint['board']]}, NimStore.MAX_WORDS)[0]
+    try:
+        root_state = tuple(checkpoint['root_state'])
+        next_segment = int(checkpoint.get('next_segment', 1))
+        if len(root_state) != 3 or not all(type(mask) is int and mask >= 0 for mask in root_state):
+            raise ValueError
+    except (TypeError, KeyError, ValueError):
+        raise NimStore.NimStoreError(f"{filename} has an invalid root state.") from None
+    tables = checkpoint_tables(filename)
+    for table in tables[1:]:
+        checkpoint = read_checkpoint_meta(table, board, root_state)
+    next_segment += len(tables) - 1
+    try:
+        states = [tuple(state) for state, _ in checkpoint['stack']]
+        values = [[int(value) for value in values] for _, values in checkpoint['stack']]
+        if any(len(state) != 3 or not all(type(mask) is int and mask >= 0 for mask in state) for state in states):
+            raise ValueError
+    except (TypeError, KeyError, ValueError):
+        raise NimStore.NimStoreError(f"{tables[-1]} has an invalid solver stack.") from None
+    for table in tables:
+        board_nim_values.update((key, nim_value) for key, nim_value in NimStore.iter_positions(table) if nim_value is not None)
+    checkpoint_progress[filename] = (next_segment, None)
+    stack = []
+    for state, frame_values in zip(states, values):
+        frame = new_solver_frame(board, state)
+        frame[3].extend(frame_values)
+        stack.append(frame)
+    return board, root_state, stack
+
+def resume_from_checkpoint(filename, progress=None, cancel=None, report_every=1000, checkpoint_every=300.0):
+    """
+    Continue a solve from its last checkpoint, writing new checkpoints to the same file. The checkpoint and its
+    segments are first compacted into one file.
+
+    Args:
+        filename (str): The checkpoint file.
+        progress, cancel, report_every, checkpoint_every: See calculate_nim_value_with_progress.
+
+    Returns:
+        tuple: The board, the root state and its Nim value.
+    """
+    board, root_state, stack = load_checkpoint(filename)
+    key = position_key(board, root_state)
+    if key in board_nim_values:
+        return board, root_state, board_nim_values[key]
+    if not stack:
+        stack = [new_solver_frame(board, root_state)]
+    save_checkpoint(filename, board, root_state, stack, compact=True)
+    return board, root_state, run_solver_stack(board, stack, progress, cancel, report_every, filename, checkpoint_every)
+
 ##### DEC 19    ####################
 def calculate_nim_value_without_hyperedges(vertices, edges):
     """
@@ -60,14 +734,197 @@ def calculate_nim_value_without_hyperedges(vertices, edges):
     Returns:
         int: The Nim value of the game state.
     """
-    state = (tuple(vertices), tuple(map(tuple, edges)))
-    if state in nim_values:
-        return nim_values[state]
+    # Only the graph matters, not where its vertices are drawn
+    return calculate_graph_nim_value(len(vertices), edges)
+
+def graph_key(n, edges):
+    """
+    The key a plain graph is stored under in nim_values.
+
+    Args:
+        n (int): The number of vertices.
+        edges (iterable): The edges as pairs of vertices 0..n-1.
+
+    Returns:
+        tuple: (n, sorted edges with the smaller vertex first).
+    """
+    return n, tuple(sorted({(u, v) if u < v else (v, u) for u, v in edges}))
+
+def board_graph(board, state):
+    """
+    The graph of a position without hyperedges, with its vertices numbered in board order.
+
+    Args:
+        board (Board): The board the position is played on.
+        state (tuple): The state of the position. Its hyperedges are ignored.
+
+    Returns:
+        tuple: (number of vertices, list of edges).
+    """
+    vertex_mask, edge_mask, _ = state
+    index = {v: i for i, v in enumerate(iter_bits(vertex_mask))}
+    return len(index), [(index[board.edges[e][0]], index[board.edges[e][1]]) for e in iter_bits(edge_mask)]
+
+def graph_components(key):
+    """
+    The connected components of a graph, each as a graph_key with its vertices renumbered in order.
+    """
+    n, edges = key
+    neighbours = [[] for _ in range(n)]
+    for u, v in edges:
+        neighbours[u].append(v)
+        neighbours[v].append(u)
+    component_of = [None] * n
+    found = []
+    for start in range(n):
+        if component_of[start] is None:
+            component_of[start] = len(found)
+            vertices = [start]
+            for u in vertices:
+                for v in neighbours[u]:
+                    if component_of[v] is None:
+                        component_of[v] = len(found)
+                        vertices.append(v)
+            found.append(sorted(vertices))
+    components = []
+    for i, vertices in enumerate(found):
+        index = {v: j for j, v in enumerate(vertices)}
+        components.append((len(vertices), tuple((index[u], index[v]) for u, v in edges if component_of[u] == i)))
+    return components
+
+def graph_invariants(key):
+    """
+    Cheap isomorphism invariants of a graph: the number of vertices and edges, the sorted degree sequence and the
+    number of triangles. Isomorphic graphs always have equal invariants.
+    """
+    n, edges = key
+    adjacency = np.zeros((n, n), dtype=np.int64)
+    if edges:
+        u, v = np.array(edges).T
+        adjacency[u, v] = adjacency[v, u] = 1
+    degrees = adjacency.sum(axis=1)
+    # The trace of A^3 counts every triangle once from each vertex, in both directions
+    triangles = int(np.trace(adjacency @ adjacency @ adjacency)) // 6
+    return n, len(edges), tuple(np.sort(degrees).tolist()), triangles
+
+def graph_moves(key):
+    """
+    The graphs reachable in one move: removing a vertex and its edges, or removing an edge. Moves that lead to the
+    same graph are listed once.
+    """
+    n, edges = key
+    children = set()
+    for removed in range(n):
+        children.add((n - 1, tuple((u - (u > removed), v - (v > removed)) for u, v in edges if removed != u and removed != v)))
+    for i in range(len(edges)):
+        children.add((n, edges[:i] + edges[i + 1:]))
+    return children
+
+def lookup_isomorphic_graph_nim_value(key, invariants):
+    """
+    Look up the Nim value of a solved graph isomorphic to this one, canonicalizing the bucket of its invariants if
+    needed.
+
+    Returns:
+        tuple: The Nim value, or None if no isomorphic graph has been solved, and the canonical form of the graph, or
+        None if it was not needed. Pass the form on to store_graph_nim_value so it is not computed twice.
+    """
+    bucket = graph_buckets.get(invariants)
+    if bucket is None:
+        return None, None
+    if bucket['forms'] is None:
+        bucket['forms'] = {}
+        for other, nim_value in bucket['graphs']:
+            bucket['forms'].setdefault(Canonical.graph_canonical_form(*other), nim_value)
+    form = Canonical.graph_canonical_form(*key)
+    return bucket['forms'].get(form), form
+
+def store_graph_nim_value(key, nim_value, invariants=None, form=None):
+    """
+    Store the Nim value of a connected graph in both levels of the graph table. The canonical form is only computed
+    if the bucket of the graph has been canonicalized and it is not given.
+    """
+    nim_values[key] = nim_value
+    bucket = graph_buckets.setdefault(invariants or graph_invariants(key), {'graphs': [], 'forms': None})
+    if bucket['forms'] is None:
+        bucket['graphs'].append((key, nim_value))
+    else:
+        bucket['forms'].setdefault(Canonical.graph_canonical_form(*key) if form is None else form, nim_value)
+
+def add_graph_nim_values(graphs):
+    """
+    Add Nim values of graphs solved elsewhere, for example loaded from a graphs table, to the graph table.
+
+    Args:
+        graphs (dict): Nim values by graph_key.
+    """
+    for key, nim_value in graphs.items():
+        if key not in nim_values:
+            if len(graph_components(key)) == 1:
+                store_graph_nim_value(key, nim_value)
+            else:
+                nim_values[key] = nim_value
+
+def lookup_graph_nim_value(n, edges):
+    """
+    Look up the Nim value of a plain graph without calculating it: the XOR of the values of its components.
+
+    Args:
+        n (int): The number of vertices.
+        edges (iterable): The edges as pairs of vertices 0..n-1.
+
+    Returns:
+        int: The Nim value, or None if some component has not been solved yet.
+    """
+    key = graph_key(n, edges)
+    nim_value = nim_values.get(key)
+    if nim_value is not None:
+        return nim_value
+    nim_value = 0
+    for component in graph_components(key):
+        component_value = nim_values.get(component)
+        if component_value is None:
+            component_value, _ = lookup_isomorphic_graph_nim_value(component, graph_invariants(component))
+            if component_value is None:
+                return None
+        nim_value ^= component_value
+    return nim_value
+
+def calculate_graph_nim_value(n, edges):
+    """
+    Calculate the Nim value of a plain graph, in which a move removes a vertex with its edges or removes an edge.
+
+    The graph is the game sum of its connected components, so its Nim value is the XOR of theirs. Every graph is
+    memoized in nim_values under its own key, and a connected graph is shared with the graphs isomorphic to it
+    through graph_buckets.
+
+    Args:
+        n (int): The number of vertices.
+        edges (iterable): The edges as pairs of vertices 0..n-1.
+
+    Returns:
+        int: The Nim value of the graph.
+    """
+    key = graph_key(n, edges)
+    nim_value = nim_values.get(key)
+    if nim_value is not None:
+        return nim_value
 
-    next_states = get_possible_moves_without_hyperedges(vertices, edges)
-    next_nim_values = [calculate_nim_value_without_hyperedges(*next_state) for next_state in next_states]
-    nim_value = mex(next_nim_values)
-    nim_values[state] = nim_value
+    components = graph_components(key)
+    if len(components) == 1:
+        invariants = graph_invariants(key)
+        nim_value, form = lookup_isomorphic_graph_nim_value(key, invariants)
+        if nim_value is None:
+            if stats is not None:
+                stats.expand()
+            nim_value = mex([calculate_graph_nim_value(*child) for child in graph_moves(key)])
+            store_graph_nim_value(key, nim_value, invariants, form)
+            return nim_value
+    else:
+        nim_value = 0
+        for component in components:
+            nim_value ^= calculate_graph_nim_value(*component)
+    nim_values[key] = nim_value
     return nim_value
 
 ##### DEC 19
@@ -82,16 +939,8 @@ def get_possible_moves_without_hyperedges(vertices, edges):
     Returns:
         list: List of possible next states.
     """
-    possible_moves = []
-    for i, vertex in enumerate(vertices):
-        new_vertices = vertices[:i] + vertices[i+1:]
-        new_edges = [edge for edge in edges if i not in edge]
-        possible_moves.append((new_vertices, new_edges))
-    for edge in edges:
-        new_edges = edges[:]
-        new_edges.remove(edge)
-        possible_moves.append((vertices, new_edges))
-    return possible_moves
+    board, state = Board.locate(vertices, edges, [])
+    return [board.to_lists(next_state)[:2] for _, _, next_state in board.moves(state)]
 ########################################
 
 def mex(values):
@@ -110,61 +959,187 @@ def mex(values):
         mex_value += 1
     return mex_value
 
-def save_game_state(vertices, edges, hyperedges):
-    state = (tuple(vertices), tuple(map(tuple, edges)), tuple(map(tuple, hyperedges)))
-    if state not in game_states:
-        # nim_value = calculate_nim_value(vertices, edges, hyperedges)
-        # game_states[state] = {
-        #     'possible_moves': get_possible_moves(vertices, edges, hyperedges),
-        #     'nim_value': nim_value
-        # }
-        game_states[state] = {
-            'possible_moves': get_possible_moves(vertices, edges, hyperedges)
-        }
-
-def save_current_game_state(vertices, edges, hyperedges, player1, player2, current_player):
+def save_game_state(board, state):
+    """
+    Record a position reached in the game together with its Nim value, if it is already known. The possible next
+    states are not stored: they are board.moves(state).
+
+    Args:
+        board (Board): The board the game is played on.
+        state (tuple): The state of the position.
+    """
+    key = position_key(board, state)
+    nim_value = lookup_nim_value(board, state)
+    # Positions recorded while the saved states load in the background are merged into them when loading finishes
+    with game_states_lock:
+        entry = game_states.setdefault(key, {})
+        if nim_value is not None:
+            entry['nim_value'] = nim_value
+
+def migrate_game_states(states):
+    """
+    Convert game states saved with list keys (vertex coordinates, edges, hyperedges) to the Board keys used now.
+
+    Args:
+        states (dict): The loaded game states.
+
+    Returns:
+        dict: The game states keyed by position_key.
+    """
+    migrated = {}
+    for key, entry in states.items():
+        if len(key) == 3:
+            board, state = Board.locate(*key)
+            key = position_key(board, state)
+        migrated[key] = {'nim_value': entry['nim_value']} if 'nim_value' in entry else {}
+    return migrated
+
+def save_current_game_state(vertices, edges, hyperedges, player1, player2, current_player, rows=None, cols=None):
     game_over = not vertices and not edges and not hyperedges
     state = {
+        'version': CURRENT_GAME_VERSION,
         'vertices': vertices,
         'edges': edges,
         'hyperedges': hyperedges,
         'player1': player1,
         'player2': player2,
         'current_player': current_player,
-        'game_over': game_over
+        'game_over': game_over,
+        'rows': rows,
+        'cols': cols
     }
-    with open('current_game_state.pkl', 'wb') as f:
-        pickle.dump(state, f)
+    with open('current_game_state.json', 'w') as f:
+        json.dump(state, f)
 
 def save_game_states_to_file(filename):
-    with open(filename, 'wb') as f:
-        # pickle.dump((game_states, nim_values), f)
-        pickle.dump(game_states, f)
+    """
+    Merge the game states into a NimStore positions table (see NimStore.py for the format). Other running instances
+    may save to the same table: their positions are kept, and the ones they added are loaded into game_states. If
+    the states are still loading in the background, this waits for the load to finish so no saved state is lost.
+    """
+    wait_for_game_states()
+    with game_states_lock:
+        positions = [(key, entry.get('nim_value')) for key, entry in game_states.items()]
+    merged = NimStore.merge_positions(filename, positions)
+    with game_states_lock:
+        for key, nim_value in merged.items():
+            entry = game_states.setdefault(key, {})
+            if nim_value is not None:
+                entry['nim_value'] = nim_value
+
+def share_board_nim_values(filename):
+    """
+    Exchange solved positions with other solver processes through a shared positions table: the Nim values in
+    board_nim_values are merged into the table, and the values the others stored are added to board_nim_values.
+
+    Args:
+        filename (str): The shared table file.
+    """
+    merged = NimStore.merge_positions(filename, board_nim_values.items())
+    board_nim_values.update((key, nim_value) for key, nim_value in merged.items() if nim_value is not None)
 
-def load_game_states_from_file(filename):
-    # global , nim_values
-    global game_states
+def read_game_states(filename):
+    """
+    Read the game states written by save_game_states_to_file. If the table does not exist yet but a pickle file with
+    the same name and a .pkl extension does (the format used before NimStore), the states are migrated from it.
+
+    Args:
+        filename (str): The table file.
+
+    Returns:
+        dict: The game states keyed by position_key.
+    """
+    legacy = os.path.splitext(filename)[0] + '.pkl'
     if os.path.exists(filename):
-        with open(filename, 'rb') as f:
-            game_states = pickle.load(f)
-            # data = pickle.load(f)
-            # if isinstance(data, tuple) and len(data) == 2:
-            #     game_states, nim_values = pickle.load(f)
-            #     game_states = pickle.load(f)
-            #
-            # else:
-            #     raise ValueError("Unexpected data format in the pickle file.")
-    else:
-        game_states = {}
-      # nim_values = {}
+        return {key: {} if nim_value is None else {'nim_value': nim_value}
+                for key, nim_value in NimStore.iter_positions(filename)}
+    if os.path.exists(legacy):
+        # Only ever read the pickle this program wrote itself; it is replaced by the table on the next save
+        with open(legacy, 'rb') as f:
+            return migrate_game_states(pickle.load(f))
+    return {}
+
+def load_game_states_from_file(filename, background=False):
+    """
+    Load the game states written by save_game_states_to_file.
+
+    Args:
+        filename (str): The table file.
+        background (bool, optional): Load in a background thread and return at once, so startup time does not grow
+            with the number of collected states. Positions can be recorded while loading; anything that needs the
+            whole table calls wait_for_game_states first. Defaults to False.
+    """
+    global game_states, game_states_error
+    # Never start a load while another is still merging
+    game_states_loaded.wait()
+    game_states_error = None
+    if not background:
+        game_states = read_game_states(filename)
+        return
+    game_states_loaded.clear()
+    threading.Thread(target=finish_loading_game_states, args=(filename,), daemon=True).start()
+
+def finish_loading_game_states(filename):
+    """
+    Read the game states in the background and merge the positions recorded meanwhile into them.
+    """
+    global game_states, game_states_error
+    try:
+        loaded = read_game_states(filename)
+        with game_states_lock:
+            for key, entry in game_states.items():
+                loaded.setdefault(key, {}).update(entry)
+            game_states = loaded
+    except Exception as error:
+        game_states_error = error
+    finally:
+        game_states_loaded.set()
+
+def wait_for_game_states():
+    """
+    Block until a background load started by load_game_states_from_file has finished.
+
+    Raises:
+        Exception: The error that stopped the background load, if any.
+    """
+    game_states_loaded.wait()
+    if game_states_error is not None:
+        raise game_states_error
 
 def load_current_game_state():
-    if os.path.exists('current_game_state.pkl'):
-        with open('current_game_state.pkl', 'rb') as f:
-            state = pickle.load(f)
-            if not state['vertices'] and not state['edges'] and not state['hyperedges']:
-                return None
-            if state['game_over']:
+    """
+    Load the game saved by save_current_game_state.
+
+    Returns:
+        dict: The saved game, or None if there is none that can be continued. A file that is damaged or from
+        another version is ignored.
+    """
+    try:
+        with open('current_game_state.json') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        # json.JSONDecodeError is a ValueError
+        return None
+    if not isinstance(state, dict) or state.get('version') != CURRENT_GAME_VERSION:
+        return None
+    if any(name not in state for name in ['player1', 'player2', 'current_player']):
+        return None
+    try:
+        if not state['vertices'] and not state['edges'] and not state['hyperedges']:
+            return None
+        if state['game_over']:
+            return None
+        # JSON has no tuples
+        for name in ['vertices', 'edges', 'hyperedges']:
+            state[name] = [tuple(item) for item in state[name]]
+        if state.get('rows') is None:
+            # Older saves do not store the board size, so recover it from the vertex coordinates. The game only plays
+            # on grids, so a save that is not on one cannot be continued
+            board, _ = Board.locate(state['vertices'], state['edges'], state['hyperedges'])
+            if board.rows is None:
                 return None
-            return state
-    return None
\ No newline at end of file
+            state['rows'], state['cols'] = board.rows, board.cols
+        Board.locate(state['vertices'], state['edges'], state['hyperedges'], rows=state['rows'], cols=state['cols'])
+    except (KeyError, TypeError, ValueError, IndexError):
+        return None
+    return state
@@ -0,0 +1,56 @@
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+import NimStore
+from GameStates import migrate_game_states
+
+
+def convert_legacy(filename, directory):
+    """
+    Convert a game_states.pkl or graphs.dict pickle to a table in directory so it can be merged. Only the file being
+    converted is held in memory. Pickle files run code when they are loaded, so only convert files you trust.
+
+    Returns:
+        str: The converted table.
+    """
+    with open(filename, 'rb') as f:
+        data = pickle.load(f)
+    table = os.path.join(directory, f"{len(os.listdir(directory))}.tawn")
+    if filename.endswith('.dict'):
+        NimStore.save_graphs(table, data)
+    else:
+        NimStore.save_positions(table, ((key, entry.get('nim_value')) for key, entry in migrate_game_states(data).items()))
+    return table
+
+
+def print_conflict(description, kept, other):
+    print(f"CONFLICT {description}: kept {kept}, other value {other}", file=sys.stderr)
+
+
+def main():
+    """
+    Merge Nim value tables from many runs into one deduplicated table. The inputs are merged as sorted streams, so
+    memory use stays bounded however large they are. Exits with 1 if two inputs disagree on a Nim value.
+    """
+    parser = argparse.ArgumentParser(description="Merge Nim value tables from many runs into one table.")
+    parser.add_argument("files", nargs="+", help=".tawn tables, or legacy game_states .pkl and graphs .dict files")
+    parser.add_argument("-o", "--output", required=True, help="merged table (may be one of the inputs)")
+    parser.add_argument("--chunk-size", type=int, default=65536, help="records read from each input at a time")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        tables = [convert_legacy(filename, directory) if filename.endswith(('.pkl', '.dict')) else filename
+                  for filename in args.files]
+        try:
+            count, conflicts = NimStore.merge_tables(tables, args.output, args.chunk_size, print_conflict)
+        except (NimStore.NimStoreError, OSError) as error:
+            parser.error(str(error))
+    print(f"Merged {len(args.files)} tables into {args.output}: {count} records, {conflicts} conflicts", file=sys.stderr)
+    if conflicts:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,688 @@
+"""
+A safe, versioned binary format for tables of Nim values (".tawn" files).
+
+Unlike pickle, reading a table never runs code from the file: the header is checked and the records are read as a
+plain numpy array, so tables can be shared between labs without trusting the sender.
+
+Layout (all integers little-endian):
+
+    magic        4 bytes   b"TAWN"
+    version      uint16    FORMAT_VERSION
+    kind         uint16    KIND_POSITIONS or KIND_GRAPHS
+    words        uint16    number of uint64 words in each record key
+    reserved     uint16    0
+    count        uint64    number of records
+    meta_length  uint32    length of the metadata in bytes
+    metadata     meta_length bytes of UTF-8 JSON
+    records      count fixed-width records (see record_dtype)
+
+Every record has a group (uint16), a key of `words` uint64 words with the most significant word first, and a Nim
+value (int16, -1 if unknown). Records are sorted by group and key, so a table can be searched with np.searchsorted
+and several tables can be merged in one pass.
+
+KIND_POSITIONS tables store positions on boards. The metadata lists the boards
+({"boards": [{"key", "rows", "cols"} or {"key", "vertices", "edges", "hyperedges"}]}); the group is the index of
+the board and the key is the state packed as vertex_mask | edge_mask << V | hyperedge_mask << (V + E).
+
+Several processes can share a table. Writers take an exclusive lock on "<table>.lock", merge their records into
+what is already stored (see merge_positions and merge_graphs) and replace the file atomically. Readers need no lock:
+they always see either the old or the new table, never a partly written one.
+
+KIND_GRAPHS tables store plain graphs. The group is the number of vertices and the key holds the upper triangle of
+the adjacency matrix, row by row, one bit per entry.
+"""
+import bisect
+import contextlib
+import heapq
+import json
+import math
+import os
+import struct
+import time
+from itertools import chain, repeat
+from operator import itemgetter
+import numpy as np
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+from Board import Board, board_for_key, encode_state
+
+MAGIC = b"TAWN"
+FORMAT_VERSION = 1
+KIND_POSITIONS = 1
+KIND_GRAPHS = 2
+HEADER = struct.Struct("<4sHHHHQI")
+
+# The Nim value stored for positions that have not been solved
+UNKNOWN = -1
+# The most words a record key may have: 4096 bits, far more than any board or graph that can be solved
+MAX_WORDS = 64
+
+
+class NimStoreError(ValueError):
+    """
+    Raised when a file is not a valid table of this format.
+    """
+
+
+def record_dtype(words):
+    """
+    The numpy dtype of the records of a table whose keys have this many words.
+    """
+    return np.dtype([('group', '<u2'), ('key', '<u8', (words,)), ('nim_value', '<i2')])
+
+
+def pack_key(value, words):
+    """
+    Split a non-negative integer into uint64 words, most significant first.
+    """
+    return [(value >> (64 * (words - 1 - i))) & 0xFFFFFFFFFFFFFFFF for i in range(words)]
+
+
+def unpack_key(key):
+    """
+    Join uint64 words (most significant first) back into an integer.
+    """
+    value = 0
+    for word in key:
+        value = (value << 64) | int(word)
+    return value
+
+
+def sort_records(records):
+    """
+    Sort records by group and key.
+    """
+    words = records['key'].shape[1]
+    order = np.lexsort(tuple(records['key'][:, i] for i in reversed(range(words))) + (records['group'],))
+    return records[order]
+
+
+def write_table(filename, kind, meta, records):
+    """
+    Write a table atomically: the file is written under a temporary name and then renamed over the old one.
+
+    Args:
+        filename (str): The table file.
+        kind (int): KIND_POSITIONS or KIND_GRAPHS.
+        meta (dict): The metadata, stored as JSON.
+        records (numpy.ndarray): The records, with the dtype from record_dtype.
+    """
+    records = sort_records(records)
+    meta_bytes = json.dumps(meta).encode()
+    temporary = filename + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, kind, records['key'].shape[1], 0, len(records), len(meta_bytes)))
+        f.write(meta_bytes)
+        f.write(records.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, filename)
+
+
+@contextlib.contextmanager
+def locked(filename):
+    """
+    Hold an exclusive lock on a table for the duration of a with block, across processes and machines sharing the
+    file system. The lock is taken on "<filename>.lock", so the table itself can still be replaced atomically.
+    """
+    with open(filename + '.lock', 'a+b') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    msvcrt.locking(lock.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+            else:
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def write_table_stream(filename, kind, meta, words, chunks):
+    """
+    Write a table from record chunks that are already sorted, without holding the whole table in memory. The record
+    count in the header is filled in at the end, and the file is replaced atomically like write_table does.
+
+    Args:
+        filename (str): The table file.
+        kind (int): KIND_POSITIONS or KIND_GRAPHS.
+        meta (dict): The metadata, stored as JSON.
+        words (int): The number of words in each key.
+        chunks (iterable): Record arrays with the dtype from record_dtype(words), in sorted order.
+
+    Returns:
+        int: Number of records written.
+    """
+    meta_bytes = json.dumps(meta).encode()
+    temporary = filename + '.tmp'
+    count = 0
+    with open(temporary, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, kind, words, 0, 0, len(meta_bytes)))
+        f.write(meta_bytes)
+        for chunk in chunks:
+            f.write(chunk.tobytes())
+            count += len(chunk)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, kind, words, 0, count, len(meta_bytes)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, filename)
+    return count
+
+
+def read_header(filename):
+    """
+    Read and check the header of a table.
+
+    Returns:
+        tuple: The kind, the metadata, the record dtype, the offset of the records and their count.
+
+    Raises:
+        NimStoreError: If the file is not a valid table of a supported version.
+    """
+    size = os.path.getsize(filename)
+    with open(filename, 'rb') as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise NimStoreError(f"{filename} is too short to be a Nim table.")
+        magic, version, kind, words, _, count, meta_length = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise NimStoreError(f"{filename} is not a Nim table.")
+        if version != FORMAT_VERSION:
+            raise NimStoreError(f"{filename} has format version {version}; this program reads version {FORMAT_VERSION}.")
+        if kind not in (KIND_POSITIONS, KIND_GRAPHS) or not 0 < words <= MAX_WORDS:
+            raise NimStoreError(f"{filename} has an invalid header.")
+        try:
+            meta = json.loads(f.read(meta_length).decode())
+        except (UnicodeDecodeError, ValueError):
+            raise NimStoreError(f"{filename} has invalid metadata.") from None
+    dtype = record_dtype(words)
+    offset = HEADER.size + meta_length
+    if size != offset + count * dtype.itemsize:
+        raise NimStoreError(f"{filename} is truncated or has trailing data.")
+    return kind, meta, dtype, offset, count
+
+
+def read_table(filename, mmap=False):
+    """
+    Read a table.
+
+    Args:
+        filename (str): The table file.
+        mmap (bool, optional): Map the records from the file instead of reading them into memory. Defaults to False.
+
+    Returns:
+        tuple: The kind, the metadata and the records.
+    """
+    kind, meta, dtype, offset, count = read_header(filename)
+    if mmap:
+        if count == 0:
+            return kind, meta, np.zeros(0, dtype)
+        return kind, meta, np.memmap(filename, dtype, 'r', offset, (count,))
+    return kind, meta, np.fromfile(filename, dtype, count, offset=offset)
+
+
+def iter_record_chunks(filename, chunk_size=65536):
+    """
+    Yield the records of a table as arrays of at most chunk_size records, in the order they are stored.
+    """
+    _, _, records = read_table(filename, mmap=True)
+    for start in range(0, len(records), chunk_size):
+        yield np.array(records[start:start + chunk_size])
+
+
+def board_meta(board):
+    """
+    The metadata that identifies a board in a positions table.
+    """
+    if board.rows is not None:
+        return {'key': board.key, 'rows': board.rows, 'cols': board.cols}
+    return {'key': board.key, 'vertices': board.vertices, 'edges': board.edges, 'hyperedges': board.hyperedges}
+
+
+def board_from_meta(meta):
+    """
+    The board described by board_meta.
+    """
+    if 'rows' in meta:
+        return Board.grid(meta['rows'], meta['cols'])
+    return Board(meta['vertices'], meta['edges'], meta['hyperedges'])
+
+
+def boards_from_meta(filename, meta, words):
+    """
+    The boards listed in the metadata of a positions table, checked before they are built: every board must be a
+    grid or a layout whose states fit in the record keys, and must have the key it is listed under.
+
+    Args:
+        filename (str): The table file, for error messages.
+        meta (dict): The metadata of the table.
+        words (int): The number of words in each record key.
+
+    Returns:
+        list: The boards, indexed by record group.
+
+    Raises:
+        NimStoreError: If the board metadata is invalid.
+    """
+    boards = meta.get('boards') if isinstance(meta, dict) else None
+    if not isinstance(boards, list):
+        raise NimStoreError(f"{filename} has no board list.")
+    board_list = []
+    for board in boards:
+        try:
+            if 'rows' in board:
+                rows, cols = board['rows'], board['cols']
+                if type(rows) is not int or type(cols) is not int or rows < 1 or cols < 1:
+                    raise ValueError
+                # Vertices, edges and squares of the grid, counted without building it
+                elements = rows * cols + rows * (cols - 1) + (rows - 1) * cols + (rows - 1) * (cols - 1)
+            else:
+                elements = len(board['vertices']) + len(board['edges']) + len(board['hyperedges'])
+            if elements > 64 * words:
+                raise ValueError
+            built = board_from_meta(board)
+            if built.key != board['key']:
+                raise ValueError
+        except (TypeError, KeyError, ValueError, IndexError):
+            raise NimStoreError(f"{filename} has invalid board metadata.") from None
+        board_list.append(built)
+    return board_list
+
+
+def check_groups(filename, groups, board_count):
+    """
+    Check that the record groups of a positions table all name one of its boards.
+
+    Raises:
+        NimStoreError: If a group is out of range.
+    """
+    if len(groups) and int(groups.max()) >= board_count:
+        raise NimStoreError(f"{filename} has records of a board it does not list.")
+
+
+def state_to_int(board, state):
+    vertex_mask, edge_mask, hyperedge_mask = state
+    return vertex_mask | edge_mask << len(board.vertices) | hyperedge_mask << (len(board.vertices) + len(board.edges))
+
+
+def int_to_state(board, value):
+    vertices, edges = len(board.vertices), len(board.edges)
+    return value & ((1 << vertices) - 1), (value >> vertices) & ((1 << edges) - 1), value >> (vertices + edges)
+
+
+def save_positions(filename, positions, meta=None):
+    """
+    Write positions and their Nim values as a KIND_POSITIONS table.
+
+    Args:
+        filename (str): The table file.
+        positions (dict or iterable): Nim values or None by (board key, state), or pairs of them.
+        meta (dict, optional): More metadata to store with the list of boards. Defaults to None.
+    """
+    # The columns are read with map and itemgetter, which run in C, instead of a Python loop per position
+    positions = positions if isinstance(positions, dict) else dict(positions)
+    count = len(positions)
+    board_keys = sorted(set(map(itemgetter(0), positions)))
+    board_list = [board_for_key(key) for key in board_keys]
+    groups = {key: i for i, key in enumerate(board_keys)}
+    words = max([1] + [-(-(len(b.vertices) + len(b.edges) + len(b.hyperedges)) // 64) for b in board_list])
+    records = np.zeros(count, record_dtype(words))
+    if len(board_keys) > 1:
+        records['group'] = np.fromiter(map(groups.__getitem__, map(itemgetter(0), positions)), np.uint16, count)
+    nim_values = positions.values()
+    if None in nim_values:
+        nim_values = [UNKNOWN if nim_value is None else nim_value for nim_value in nim_values]
+    records['nim_value'] = np.fromiter(nim_values, np.int16, count)
+    if words == 1:
+        # Every mask fits in a word, so the states are packed like state_to_int with numpy, one board at a time
+        masks = np.fromiter(chain.from_iterable(map(itemgetter(1), positions)), np.uint64, 3 * count).reshape(count, 3)
+        for group, board in enumerate(board_list):
+            rows = records['group'] == group
+            vertices, edges = len(board.vertices), len(board.edges)
+            packed = masks[rows, 0]
+            if board.edges:
+                packed |= masks[rows, 1] << np.uint64(vertices)
+            if board.hyperedges:
+                packed |= masks[rows, 2] << np.uint64(vertices + edges)
+            records['key'][rows, 0] = packed
+    else:
+        packed = [state_to_int(board_list[groups[key]], state) for key, state in positions]
+        for i in range(words):
+            shift = 64 * (words - 1 - i)
+            records['key'][:, i] = [(value >> shift) & 0xFFFFFFFFFFFFFFFF for value in packed]
+    write_table(filename, KIND_POSITIONS, dict(meta or {}, boards=[board_meta(b) for b in board_list]), records)
+
+
+def save_board_positions(filename, board, states, nim_values):
+    """
+    Write positions of one board with at most 64 vertices, edges and hyperedges as a KIND_POSITIONS table, given in
+    bulk as arrays: the states packed by state_to_int and their Nim values.
+
+    Args:
+        filename (str): The table file.
+        board (Board): The board of the positions.
+        states (numpy.ndarray): The packed states, as uint64.
+        nim_values (numpy.ndarray): The Nim value of every state.
+    """
+    records = np.zeros(len(states), record_dtype(1))
+    records['key'][:, 0] = states
+    records['nim_value'] = nim_values
+    write_table(filename, KIND_POSITIONS, {'boards': [board_meta(board)]}, records)
+
+
+def decode_states(board, keys):
+    """
+    The states packed in an array of record keys, all on the same board. Keys that fit in one word are split with
+    numpy; longer keys are joined into Python integers first.
+    """
+    vertices, edges = len(board.vertices), len(board.edges)
+    if keys.shape[1] == 1:
+        keys = keys[:, 0]
+        vertex_masks = (keys & np.uint64((1 << vertices) - 1)).tolist()
+        edge_masks = ((keys >> np.uint64(vertices)) & np.uint64((1 << edges) - 1)).tolist()
+        hyperedge_masks = (keys >> np.uint64(vertices + edges)).tolist()
+        return list(zip(vertex_masks, edge_masks, hyperedge_masks))
+    big_endian = keys.astype('>u8').tobytes()
+    size = keys.shape[1] * 8
+    return [int_to_state(board, int.from_bytes(big_endian[i:i + size], 'big')) for i in range(0, len(big_endian), size)]
+
+
+def iter_positions(filename, chunk_size=65536):
+    """
+    Yield ((board key, state), Nim value or None) for every record of a KIND_POSITIONS table, reading the file in
+    chunks so memory use does not grow with the size of the table.
+    """
+    kind, meta, records = read_table(filename, mmap=True)
+    if kind != KIND_POSITIONS:
+        raise NimStoreError(f"{filename} does not store board positions.")
+    board_list = boards_from_meta(filename, meta, records['key'].shape[1])
+    for start in range(0, len(records), chunk_size):
+        chunk = np.array(records[start:start + chunk_size])
+        check_groups(filename, chunk['group'], len(board_list))
+        # Records are sorted by board, so a chunk holds a few runs of the same board
+        groups, starts = np.unique(chunk['group'], return_index=True)
+        ends = list(starts[1:]) + [len(chunk)]
+        for group, run_start, run_end in zip(groups.tolist(), starts.tolist(), ends):
+            board = board_list[group]
+            states = decode_states(board, chunk['key'][run_start:run_end])
+            for state, nim_value in zip(states, chunk['nim_value'][run_start:run_end].tolist()):
+                yield (board.key, state), None if nim_value == UNKNOWN else nim_value
+
+
+class PositionTable:
+    """
+    A positions table searched in place, for looking up single positions without loading the table into a dict.
+    The records stay in the file (memory-mapped); only the first word of every key is copied into memory so it can
+    be binary searched.
+    """
+
+    def __init__(self, filename):
+        """
+        Args:
+            filename (str): The table file.
+
+        Raises:
+            NimStoreError: If the file is not a valid positions table.
+        """
+        kind, meta, self.records = read_table(filename, mmap=True)
+        if kind != KIND_POSITIONS:
+            raise NimStoreError(f"{filename} does not store board positions.")
+        self.words = self.records['key'].shape[1]
+        board_list = boards_from_meta(filename, meta, self.words)
+        self.boards = {board.key: (i, board) for i, board in enumerate(board_list)}
+        groups = np.ascontiguousarray(self.records['group'])
+        check_groups(filename, groups, len(board_list))
+        self.ranges = [(int(np.searchsorted(groups, i, 'left')), int(np.searchsorted(groups, i, 'right')))
+                       for i in range(len(board_list))]
+        self.first_words = np.ascontiguousarray(self.records['key'][:, 0])
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, key, default=None):
+        """
+        The Nim value of a position.
+
+        Args:
+            key (tuple): The (board key, state) key of the position.
+            default (optional): Returned if the position is not in the table or its value is unknown. Defaults to None.
+        """
+        board_key, state = key
+        if board_key not in self.boards:
+            return default
+        group, board = self.boards[board_key]
+        lo, hi = self.ranges[group]
+        words = pack_key(state_to_int(board, state), self.words)
+        first_words = self.first_words[lo:hi]
+        start = lo + int(np.searchsorted(first_words, np.uint64(words[0]), 'left'))
+        end = lo + int(np.searchsorted(first_words, np.uint64(words[0]), 'right'))
+        if self.words > 1:
+            start = bisect.bisect_left(range(start, end), words, key=lambda i: self.records['key'][i].tolist()) + start
+            if start < end and self.records['key'][start].tolist() != words:
+                return default
+        if start >= end:
+            return default
+        nim_value = int(self.records['nim_value'][start])
+        return default if nim_value == UNKNOWN else nim_value
+
+
+def merge_positions(filename, positions):
+    """
+    Merge positions into a positions table shared with other processes instead of overwriting it. Known Nim values
+    replace unknown ones; a position that is only known as unknown never hides a stored value.
+
+    Args:
+        filename (str): The table file. It is created if it does not exist.
+        positions (iterable): Pairs of ((board key, state), Nim value or None).
+
+    Returns:
+        dict: Every position now in the table, with its Nim value or None.
+    """
+    with locked(filename):
+        merged = dict(iter_positions(filename)) if os.path.exists(filename) else {}
+        for key, nim_value in positions:
+            if nim_value is not None:
+                merged[key] = nim_value
+            else:
+                merged.setdefault(key, None)
+        save_positions(filename, merged)
+    return merged
+
+
+def graph_to_record(matrix):
+    """
+    The (group, key) of a graph given as an adjacency matrix.
+    """
+    n = len(matrix)
+    rows, cols = np.triu_indices(n, 1)
+    bits = np.asarray(matrix)[rows, cols] != 0
+    value = int("".join("1" if bit else "0" for bit in bits.tolist()) or "0", 2)
+    return n, value
+
+
+def record_to_graph(n, value):
+    """
+    The adjacency matrix (as floats, like networkx returns it) of a graph stored by graph_to_record.
+    """
+    matrix = np.zeros((n, n))
+    rows, cols = np.triu_indices(n, 1)
+    size = len(rows)
+    bits = [(value >> (size - 1 - i)) & 1 for i in range(size)]
+    matrix[rows, cols] = bits
+    return np.maximum(matrix, matrix.T)
+
+
+def parse_graph_key(key):
+    """
+    The adjacency matrix of a graph key written as str(matrix), the keys used by TripartiteGraphs.getNimValue. Long
+    rows are wrapped by numpy, so only the numbers are read and the matrix is rebuilt from their count.
+    """
+    numbers = [float(x) for x in key.replace("[", " ").replace("]", " ").split()]
+    n = math.isqrt(len(numbers))
+    if n * n != len(numbers):
+        raise NimStoreError(f"{key!r} is not a square adjacency matrix.")
+    return np.array(numbers).reshape(n, n)
+
+
+def save_graphs(filename, graphs, key_to_matrix=parse_graph_key):
+    """
+    Write the Nim values of graphs as a KIND_GRAPHS table.
+
+    Args:
+        filename (str): The table file.
+        graphs (dict): Nim values by graph key.
+        key_to_matrix (function, optional): Turns a key into an adjacency matrix. Defaults to parse_graph_key.
+    """
+    encoded = [graph_to_record(key_to_matrix(key)) + (nim_value,) for key, nim_value in graphs.items()]
+    words = max([1] + [-(-(n * (n - 1) // 2) // 64) for n, _, _ in encoded])
+    records = np.zeros(len(encoded), record_dtype(words))
+    for i, (n, value, nim_value) in enumerate(encoded):
+        records[i] = (n, pack_key(value, words), nim_value)
+    write_table(filename, KIND_GRAPHS, {}, records)
+
+
+def load_graphs(filename, matrix_to_key=str):
+    """
+    Read a KIND_GRAPHS table.
+
+    Args:
+        filename (str): The table file.
+        matrix_to_key (function, optional): Turns an adjacency matrix into a key. Defaults to str.
+
+    Returns:
+        dict: Nim values by graph key.
+    """
+    kind, _, records = read_table(filename)
+    if kind != KIND_GRAPHS:
+        raise NimStoreError(f"{filename} does not store graphs.")
+    return {matrix_to_key(record_to_graph(int(n), unpack_key(key))): int(nim_value)
+            for n, key, nim_value in zip(records['group'], records['key'], records['nim_value'])}
+
+
+def merge_graphs(filename, graphs, key_to_matrix=parse_graph_key, matrix_to_key=str):
+    """
+    Merge graphs into a graphs table shared with other processes instead of overwriting it.
+
+    Args:
+        filename (str): The table file. It is created if it does not exist.
+        graphs (dict): Nim values by graph key.
+        key_to_matrix, matrix_to_key (function, optional): Convert between keys and adjacency matrices, see
+            save_graphs and load_graphs.
+
+    Returns:
+        dict: Every graph now in the table, by graph key.
+    """
+    with locked(filename):
+        merged = load_graphs(filename, matrix_to_key) if os.path.exists(filename) else {}
+        merged.update(graphs)
+        save_graphs(filename, merged, key_to_matrix)
+    return merged
+
+
+def merge_tables(filenames, output, chunk_size=65536, on_conflict=None):
+    """
+    Merge any number of tables of the same kind into one deduplicated table. The sorted records of all inputs are
+    merged in a single pass, so memory use is about chunk_size records per input however large the tables are.
+
+    A known Nim value replaces an unknown one. When two tables store different known values for the same position
+    or graph, the value from the earlier table is kept and the conflict is reported.
+
+    Args:
+        filenames (list): The input tables.
+        output (str): The merged table. It may be one of the inputs.
+        chunk_size (int, optional): Records read from each input and written at a time. Defaults to 65536.
+        on_conflict (function, optional): Called as on_conflict(description, kept value, other value) for every
+            conflict. Defaults to None.
+
+    Returns:
+        tuple: The number of records written and the number of conflicts.
+    """
+    headers = [read_header(filename) for filename in filenames]
+    kinds = {kind for kind, _, _, _, _ in headers}
+    if len(kinds) != 1:
+        raise NimStoreError("Positions tables and graphs tables cannot be merged together.")
+    kind = kinds.pop()
+    words = max(dtype['key'].shape[0] for _, _, dtype, _, _ in headers)
+
+    # Every input numbers its boards in the order of their keys, so mapping them onto the sorted union of all boards
+    # keeps the records of each input sorted
+    if kind == KIND_POSITIONS:
+        boards = {}
+        for filename, (_, meta, dtype, _, _) in zip(filenames, headers):
+            boards_from_meta(filename, meta, dtype['key'].shape[0])
+            for board in meta['boards']:
+                boards.setdefault(board['key'], board)
+        board_keys = sorted(boards)
+        meta = {'boards': [boards[key] for key in board_keys]}
+        groups = {key: i for i, key in enumerate(board_keys)}
+        remaps = [np.array([groups[board['key']] for board in header_meta['boards']] or [0], dtype='<u2')
+                  for _, header_meta, _, _, _ in headers]
+    else:
+        meta = {}
+        remaps = [None] * len(headers)
+
+    def records(filename, remap, index):
+        for chunk in iter_record_chunks(filename, chunk_size):
+            if remap is not None:
+                check_groups(filename, chunk['group'], len(headers[index][1]['boards']))
+            chunk_groups = chunk['group'] if remap is None else remap[chunk['group']]
+            # Shorter keys are padded with leading zero words, which keeps their value and their order
+            keys = np.zeros((len(chunk), words), dtype='<u8')
+            keys[:, words - chunk['key'].shape[1]:] = chunk['key']
+            yield from zip(chunk_groups.tolist(), map(tuple, keys.tolist()), repeat(index), chunk['nim_value'].tolist())
+
+    def describe(group, key):
+        if kind == KIND_GRAPHS:
+            return f"graph with {group} vertices {encode_key(key)}"
+        board = board_from_meta(meta['boards'][group])
+        return f"board {board.key} state {encode_state(int_to_state(board, unpack_key(key)))}"
+
+    conflicts = 0
+
+    def merged_chunks():
+        nonlocal conflicts
+        chunk = np.zeros(chunk_size, record_dtype(words))
+        size = 0
+        last = None
+        # The index of the input breaks ties, so the earlier table's record of a position comes first
+        streams = [records(filename, remap, index) for index, (filename, remap) in enumerate(zip(filenames, remaps))]
+        for group, key, _, nim_value in heapq.merge(*streams):
+            if last is not None and (group, key) == last:
+                kept = int(chunk['nim_value'][size - 1])
+                if kept == UNKNOWN:
+                    chunk['nim_value'][size - 1] = nim_value
+                elif nim_value != UNKNOWN and nim_value != kept:
+                    conflicts += 1
+                    if on_conflict is not None:
+                        on_conflict(describe(group, key), kept, nim_value)
+                continue
+            if size == chunk_size:
+                yield chunk
+                chunk = np.zeros(chunk_size, record_dtype(words))
+                size = 0
+            chunk[size] = (group, key, nim_value)
+            size += 1
+            last = (group, key)
+        yield chunk[:size]
+
+    with locked(output):
+        count = write_table_stream(output, kind, meta, words, merged_chunks())
+    return count, conflicts
+
+
+def encode_key(key):
+    """
+    A record key as one hexadecimal number.
+    """
+    return format(unpack_key(key), 'x')
@@ -0,0 +1,182 @@
+"""
+Chooses how to calculate the Nim value of a position before starting, from an estimate of how many positions can
+be reached from it.
+
+Every reachable position is closed: each of its edges has both vertices, and each of its hyperedges has all its
+vertices and edges. Conversely every closed sub-position can be reached, by removing the hyperedges, then the edges,
+then the vertices it lacks. estimate_states samples closed sub-positions to estimate how many there are.
+
+The engines, cheapest first:
+    lookup     The Nim value is already known, from the memo or a precomputed pack.
+    layered    The numpy layered backend (see SolverBackends.py): the fastest, but it keeps every reachable
+               position in memory and cannot be cancelled, so only small boards use it.
+    search     The checkpointed search of calculate_nim_value_with_progress: slower, but it can be cancelled and
+               resumed, and it skips symmetric moves.
+    external   The external backend: the layered solver working from files on disk, for positions whose search
+               would not fit in memory.
+    anytime    A time-budgeted search (calculate_nim_value_anytime) for positions whose exact search would not fit in
+               memory. It reports the Nim value if it finds it in time and otherwise what it could prove.
+"""
+import math
+import os
+import random
+import shutil
+import tempfile
+import GameStates
+import SolverBackends
+from Board import iter_bits
+
+# Throughput and memory of the engines, measured on the 3x3 and 3x4 grids. They only need to be right to within a
+# factor of a few: the estimates are for telling seconds from hours and megabytes from gigabytes.
+LAYERED_STATES_PER_SECOND = 250000
+LAYERED_BYTES_PER_STATE = 64
+SEARCH_STATES_PER_SECOND = 50000
+SEARCH_BYTES_PER_STATE = 300
+EXTERNAL_STATES_PER_SECOND = 150000
+# The external backend keeps 9 bytes per state in its tables, and spill files of unsorted children while it runs
+EXTERNAL_DISK_BYTES_PER_STATE = 40
+# The layered backend cannot show progress or be cancelled, so it is only chosen for solves shorter than this
+LAYERED_MAX_SECONDS = 30.0
+# Memory assumed to be available when it cannot be read from the system
+DEFAULT_MEMORY = 4 * 2**30
+# The time budget of an anytime search
+ANYTIME_SECONDS = 60.0
+
+
+class Plan:
+    """
+    How a Nim value will be calculated, and what it is expected to cost.
+
+    Attributes:
+        engine (str): "lookup", "layered", "search", "external" or "anytime".
+        states (float): Estimated number of positions the engine solves.
+        seconds (float): Estimated running time.
+        memory (int): Estimated peak memory in bytes.
+        reason (str): Why the engine was chosen.
+        disk (int): Estimated peak disk space in bytes.
+    """
+    __slots__ = ('engine', 'states', 'seconds', 'memory', 'reason', 'disk')
+
+    def __init__(self, engine, states, seconds, memory, reason, disk=0):
+        self.engine = engine
+        self.states = states
+        self.seconds = seconds
+        self.memory = memory
+        self.reason = reason
+        self.disk = disk
+
+    def describe(self):
+        """
+        The estimates as lines of text for the user.
+        """
+        return [f"Engine: {self.engine} ({self.reason})",
+                f"Positions: about {self.states:.2g}",
+                f"Time: about {format_seconds(self.seconds)}",
+                f"Memory: about {format_bytes(self.memory)}"] + ([f"Disk: about {format_bytes(self.disk)}"] if self.disk else [])
+
+
+def format_seconds(seconds):
+    for unit, size in [("days", 86400), ("hours", 3600), ("minutes", 60)]:
+        if seconds >= size:
+            return f"{seconds / size:.1f} {unit}"
+    return f"{seconds:.1f} seconds"
+
+
+def format_bytes(size):
+    for unit, scale in [("TB", 2**40), ("GB", 2**30), ("MB", 2**20), ("KB", 2**10)]:
+        if size >= scale:
+            return f"{size / scale:.1f} {unit}"
+    return f"{size:.0f} bytes"
+
+
+def available_memory():
+    """
+    The physical memory of the machine in bytes, or DEFAULT_MEMORY where it cannot be read (on Windows).
+    """
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return DEFAULT_MEMORY
+
+
+def estimate_states(board, state, samples=200, seed=0):
+    """
+    Estimate the number of positions reachable from a position by sampling its closed sub-positions.
+
+    The vertex sets are sampled separately for every size k, so small and large sets are both represented: the count
+    is the sum over k of C(n, k) times the average, over vertex sets of size k, of 2^(edges among them) times
+    2^(hyperedges whose vertices and edges are all kept), with the edges kept chosen at random.
+
+    Args:
+        board (Board): The board the position is played on.
+        state (tuple): The state of the position.
+        samples (int, optional): Vertex sets sampled for every size. Defaults to 200.
+        seed (int, optional): Seed of the sampling, so the estimate of a position is always the same. Defaults to 0.
+
+    Returns:
+        float: The estimated number of reachable positions, including the position itself and the empty one.
+    """
+    rng = random.Random(seed)
+    vertex_mask, edge_mask, hyperedge_mask = state
+    vertices = list(iter_bits(vertex_mask))
+    edges = [(e, (1 << board.edges[e][0]) | (1 << board.edges[e][1])) for e in iter_bits(edge_mask)]
+    hyperedges = []
+    for h in iter_bits(hyperedge_mask):
+        hyperedge_vertices = sum(1 << v for v in board.hyperedges[h])
+        hyperedge_edges = sum(1 << e for e, _ in edges if board.edge_hyperedges[e] >> h & 1)
+        hyperedges.append((hyperedge_vertices, hyperedge_edges))
+
+    total = 0.0
+    for k in range(len(vertices) + 1):
+        count = math.comb(len(vertices), k)
+        weight = 0.0
+        for _ in range(min(samples, count)):
+            kept_vertices = sum(1 << v for v in rng.sample(vertices, k))
+            inner = [e for e, ends in edges if ends & kept_vertices == ends]
+            kept_edges = sum(1 << e for e in inner if rng.random() < 0.5)
+            kept_hyperedges = sum(1 for vs, es in hyperedges if vs & kept_vertices == vs and es & kept_edges == es)
+            weight += 2.0 ** (len(inner) + kept_hyperedges)
+        total += count * weight / min(samples, count)
+    return total
+
+
+def plan(board, state, memory=None):
+    """
+    Choose the engine that calculates the Nim value of a position, and estimate its cost.
+
+    Args:
+        board (Board): The board the position is played on.
+        state (tuple): The state of the position.
+        memory (int, optional): Bytes the calculation may use. Defaults to the memory of the machine.
+
+    Returns:
+        Plan: The chosen engine and its estimated cost.
+    """
+    if GameStates.lookup_nim_value(board, state) is not None:
+        return Plan("lookup", 1, 0.0, 0, "the Nim value is already known")
+    memory = available_memory() if memory is None else memory
+    states = estimate_states(board, state)
+
+    # The layered and external backends pack the states of the whole board into 64-bit integers
+    elements = len(board.vertices) + len(board.edges) + len(board.hyperedges)
+    layered_seconds = states / LAYERED_STATES_PER_SECOND
+    layered_memory = states * LAYERED_BYTES_PER_STATE
+    if elements <= SolverBackends.MAX_ELEMENTS and layered_seconds <= LAYERED_MAX_SECONDS and layered_memory <= memory:
+        return Plan("layered", states, layered_seconds, layered_memory, "small enough to solve every position at once")
+
+    # The search skips symmetric moves, so it visits about one position of every symmetric orbit
+    search_states = states / (len(board.symmetries) + 1)
+    search_memory = search_states * SEARCH_BYTES_PER_STATE
+    if search_memory <= memory:
+        return Plan("search", search_states, search_states / SEARCH_STATES_PER_SECOND, search_memory,
+                    "fits in memory; can be cancelled and resumed")
+    external_disk = states * EXTERNAL_DISK_BYTES_PER_STATE
+    if elements <= SolverBackends.MAX_ELEMENTS and external_disk <= shutil.disk_usage(tempfile.gettempdir()).free:
+        return Plan("external", states, states / EXTERNAL_STATES_PER_SECOND, memory // 4,
+                    f"a search in memory needs about {format_bytes(search_memory)}; working from files on disk",
+                    external_disk)
+
+    anytime_states = ANYTIME_SECONDS * SEARCH_STATES_PER_SECOND
+    return Plan("anytime", anytime_states, ANYTIME_SECONDS, anytime_states * SEARCH_BYTES_PER_STATE,
+                f"an exact search needs about {format_bytes(search_memory)} and "
+                f"{format_seconds(search_states / SEARCH_STATES_PER_SECOND)}; searching for {ANYTIME_SECONDS:.0f} seconds instead")
@@ -0,0 +1,107 @@
+import argparse
+import os
+import signal
+import sys
+import NimStore
+import SolverBackends
+from Board import Board
+from GameStates import share_board_nim_values, is_winning_position, calculate_nim_value_with_progress, resume_from_checkpoint, CancellationToken, SolveCancelled
+
+
+def print_progress(solved, remaining, elapsed):
+    rate = solved / elapsed if elapsed else 0
+    print(f"\rsolved {solved} positions in {elapsed:.0f}s ({rate:.0f}/s), at most {remaining} left", end="", file=sys.stderr, flush=True)
+
+
+def solve_with_backend(backend, board):
+    """
+    Solve the full board with a solver backend and print its Nim value and the backend statistics.
+    """
+    nim_value = backend.solve((board, board.full_state))
+    stats = backend.stats()
+    print(f"\n{stats['backend']}: {stats['memo_size']} positions in {stats['seconds']:.1f}s", file=sys.stderr)
+    backend.clear()
+    print(f"Nim value of the {board.key} board: {nim_value}")
+
+
+def main():
+    """
+    Solve the Nim value of an nxm grid from the command line with periodic checkpoints, or resume a solve from its
+    last checkpoint. Ctrl-C and SIGTERM (used by batch schedulers to preempt jobs) write a final checkpoint before
+    exiting, so the solve can be resumed on another node.
+    """
+    parser = argparse.ArgumentParser(description="Solve the Nim value of an nxm grid with checkpoints.")
+    parser.add_argument("rows", type=int, nargs="?", help="number of rows")
+    parser.add_argument("cols", type=int, nargs="?", help="number of columns")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: nim_checkpoint_<rows>x<cols>.tawn)")
+    parser.add_argument("--resume", metavar="CHECKPOINT", help="continue the solve saved in this checkpoint")
+    parser.add_argument("--every", type=float, default=300.0, help="seconds between checkpoints")
+    parser.add_argument("--backend", choices=list(SolverBackends.BACKENDS),
+                        help="solve with this solver backend instead, without checkpoints (default for new solves: $TAKEAWAY_SOLVER if set)")
+    parser.add_argument("--memory", type=int, default=1024, help="megabytes the external backend may use (default: 1024)")
+    parser.add_argument("--work-dir", help="directory for the layer files of the external backend; they are kept (default: a temporary directory)")
+    parser.add_argument("--share", metavar="TABLE", help="positions table shared with other solvers: start from its values and merge the results into it")
+    parser.add_argument("--outcome", action="store_true", help="only decide who wins, which stops at the first winning move")
+    args = parser.parse_args()
+    if args.resume is None and (args.rows is None or args.cols is None):
+        parser.error("give the board size or --resume CHECKPOINT")
+
+    if args.outcome:
+        if args.resume is not None or args.backend is not None or args.share is not None:
+            parser.error("--outcome cannot be combined with --resume, --backend or --share")
+        board = Board.grid(args.rows, args.cols)
+        if is_winning_position(board, board.full_state):
+            print(f"The {board.key} board is an N-position: the first player wins")
+        else:
+            print(f"The {board.key} board is a P-position: the second player wins")
+        return
+
+    backend = args.backend
+    if backend is not None:
+        if args.resume is not None:
+            parser.error("--resume continues a checkpointed solve and cannot use --backend")
+        if args.share is not None:
+            parser.error("--share exchanges the memo of the checkpointed solve and cannot use --backend")
+    elif args.resume is None and args.share is None:
+        # The environment only picks the engine of a new solve, so it never turns --resume or --share into an error
+        backend = os.environ.get(SolverBackends.BACKEND_VARIABLE) or None
+        if backend is not None and backend not in SolverBackends.BACKENDS:
+            parser.error(f"{SolverBackends.BACKEND_VARIABLE}={backend} is not a solver backend; choose one of {', '.join(SolverBackends.BACKENDS)}")
+    if backend is not None:
+        board = Board.grid(args.rows, args.cols)
+        if backend in ["layered", "external"] and len(board.vertices) + len(board.edges) + len(board.hyperedges) > SolverBackends.MAX_ELEMENTS:
+            parser.error(f"the {backend} backend handles boards of at most {SolverBackends.MAX_ELEMENTS} vertices, edges and hyperedges; use recursive or bitmask for the {board.key} board")
+        options = {'memory': args.memory * 2**20, 'directory': args.work_dir, 'progress': print_progress} if backend == "external" else {}
+        solve_with_backend(SolverBackends.get_backend(backend, **options), board)
+        return
+
+    if args.share is not None and os.path.exists(args.share):
+        share_board_nim_values(args.share)
+    cancel = CancellationToken()
+    signal.signal(signal.SIGTERM, lambda signum, frame: cancel.cancel())
+    try:
+        if args.resume is not None:
+            checkpoint = args.resume
+            try:
+                board, _, nim_value = resume_from_checkpoint(checkpoint, print_progress, cancel, checkpoint_every=args.every)
+            except NimStore.NimStoreError as error:
+                parser.error(str(error))
+        else:
+            checkpoint = args.checkpoint or f"nim_checkpoint_{args.rows}x{args.cols}.tawn"
+            if os.path.exists(checkpoint):
+                parser.error(f"{checkpoint} already exists; use --resume {checkpoint} to continue it")
+            board = Board.grid(args.rows, args.cols)
+            nim_value = calculate_nim_value_with_progress(board, board.full_state, print_progress, cancel,
+                                                          checkpoint=checkpoint, checkpoint_every=args.every)
+    except (SolveCancelled, KeyboardInterrupt):
+        print(f"\nStopped. Resume with: python Solve.py --resume {checkpoint}", file=sys.stderr)
+        if args.share is not None:
+            share_board_nim_values(args.share)
+        sys.exit(1)
+    if args.share is not None:
+        share_board_nim_values(args.share)
+    print(f"\nNim value of the {board.key} board: {nim_value}")
+
+
+if __name__ == "__main__":
+    main()
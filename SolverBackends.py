@@ -0,0 +1,490 @@
+"""
+Interchangeable solver backends.
+
+Every backend solves positions, given as (board, state) pairs, through the same interface: solve(position),
+solve_many(positions) and stats(). They return the same Nim values, so one can replace another to compare their
+speed on a workload or to pick the fastest for a board shape:
+
+    recursive  Memoized recursion that splits positions into components and shares isomorphic positions
+               (calculate_canonical_nim_value, behind the list API calculate_nim_value). This is the reference.
+    bitmask    Memoized recursion over the bitmask states of one board (calculate_board_nim_value). The game, the
+               computer player and the checkpointed searches of Solve.py and the Research menu search this way.
+    layered    Enumerates every position reachable from the roots with numpy, layer by number of remaining
+               elements, and solves each layer in bulk from the one below.
+    external   The layered solver for boards whose positions do not fit in memory. The layers are kept in files
+               and processed in chunks, so memory use is a parameter instead of the size of the state space.
+
+The layered and external backends pack a state into one uint64, so they only take boards of at most MAX_ELEMENTS
+(64) vertices, edges and hyperedges: grids up to 4x5, but not 5x5 (81 elements). Larger boards are solved with the
+recursive or bitmask backends, and Planner.plan never picks the layered or external engine for them.
+
+The backend is named with the TAKEAWAY_SOLVER environment variable or the --backend option of Solve.py and
+Benchmarks.py.
+"""
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+import GameStates
+import NimStore
+from GameStates import SolveCancelled
+
+# The environment variable naming the backend get_backend returns by default
+BACKEND_VARIABLE = "TAKEAWAY_SOLVER"
+DEFAULT_BACKEND = "recursive"
+# Memory the external backend works in when it is not given a budget
+DEFAULT_EXTERNAL_MEMORY = 2**30
+# The most vertices, edges and hyperedges a board solved by the layered and external backends may have: their states
+# are packed into one uint64
+MAX_ELEMENTS = 64
+
+
+class SolverBackend:
+    """
+    The interface of a solver backend. Subclasses implement solve_position, memo_size and clear.
+    """
+    name = None
+
+    def __init__(self):
+        self.solved = 0
+        self.seconds = 0.0
+
+    def solve(self, position):
+        """
+        Solve one position.
+
+        Args:
+            position (tuple): (board, state) of the position.
+
+        Returns:
+            int: The Nim value of the position.
+        """
+        board, state = position
+        start = time.perf_counter()
+        nim_value = self.solve_position(board, state)
+        self.seconds += time.perf_counter() - start
+        self.solved += 1
+        return nim_value
+
+    def solve_many(self, positions):
+        """
+        Solve several positions.
+
+        Args:
+            positions (iterable): (board, state) pairs.
+
+        Returns:
+            list: The Nim value of every position, in order.
+        """
+        return [self.solve(position) for position in positions]
+
+    def stats(self):
+        """
+        Statistics of the positions solved so far.
+
+        Returns:
+            dict: The backend name, the number of positions solved, the seconds spent on them and the number of
+            positions in the backend's memo.
+        """
+        return {'backend': self.name, 'solved': self.solved, 'seconds': self.seconds, 'memo_size': self.memo_size()}
+
+    def __len__(self):
+        return self.memo_size()
+
+    def solve_position(self, board, state):
+        raise NotImplementedError
+
+    def memo_size(self):
+        raise NotImplementedError
+
+    def clear(self):
+        """
+        Forget every solved position, for example before timing a workload.
+        """
+        raise NotImplementedError
+
+
+class RecursiveBackend(SolverBackend):
+    """
+    calculate_canonical_nim_value, memoized in the tables of GameStates.
+    """
+    name = "recursive"
+
+    def solve_position(self, board, state):
+        return GameStates.calculate_canonical_nim_value(board, state)
+
+    def memo_size(self):
+        return len(GameStates.board_nim_values) + len(GameStates.canonical_nim_values) + len(GameStates.nim_values)
+
+    def clear(self):
+        for table in [GameStates.board_nim_values, GameStates.canonical_nim_values, GameStates.nim_values,
+                      GameStates.graph_buckets, GameStates.winning_positions,
+                      GameStates.canonical_winning_positions]:
+            table.clear()
+
+
+class BitmaskBackend(SolverBackend):
+    """
+    calculate_board_nim_value, memoized in GameStates.board_nim_values.
+    """
+    name = "bitmask"
+
+    def solve_position(self, board, state):
+        return GameStates.calculate_board_nim_value(board, state)
+
+    def memo_size(self):
+        return len(GameStates.board_nim_values)
+
+    def clear(self):
+        GameStates.board_nim_values.clear()
+
+
+def move_masks(board):
+    """
+    The moves of a board as two arrays over the bits of NimStore.state_to_int: the bit of the element a move removes, and every
+    bit the move clears (a vertex takes its edges and hyperedges with it, and an edge its hyperedges).
+
+    Returns:
+        tuple: (removed bits, cleared bits) as uint64 arrays.
+    """
+    vertex_count, edge_count = len(board.vertices), len(board.edges)
+    removed = []
+    cleared = []
+    for v in range(len(board.vertices)):
+        removed.append(1 << v)
+        cleared.append(NimStore.state_to_int(board, (1 << v, board.vertex_edges[v], board.vertex_hyperedges[v])))
+    for e in range(edge_count):
+        removed.append(1 << (vertex_count + e))
+        cleared.append(NimStore.state_to_int(board, (0, 1 << e, board.edge_hyperedges[e])))
+    for h in range(len(board.hyperedges)):
+        removed.append(1 << (vertex_count + edge_count + h))
+        cleared.append(removed[-1])
+    return np.array(removed, dtype=np.uint64), np.array(cleared, dtype=np.uint64)
+
+
+def reachable_layers(roots, removed, cleared):
+    """
+    Every state reachable from the roots, by number of remaining elements. A move always removes at least one
+    element, so once the layers above a layer are expanded, every state of it is known.
+
+    Args:
+        roots (list): The packed root states.
+        removed, cleared (numpy.ndarray): The moves from move_masks.
+
+    Returns:
+        dict: Sorted uint64 arrays of the states by number of remaining elements.
+    """
+    pending = {}
+    for root in roots:
+        pending.setdefault(int(root).bit_count(), []).append(np.array([root], dtype=np.uint64))
+    layers = {}
+    while pending:
+        count = max(pending)
+        layer = np.unique(np.concatenate(pending.pop(count)))
+        layers[count] = layer
+        for bit, clear in zip(removed, cleared):
+            children = layer[(layer & bit) != 0] & ~clear
+            counts = np.bitwise_count(children)
+            for child_count in np.unique(counts).tolist():
+                pending.setdefault(child_count, []).append(children[counts == child_count])
+    return layers
+
+
+def solve_layers(layers, removed, cleared):
+    """
+    The Nim values of every state in the layers, from the empty state up. The mex of a layer is taken over bitsets
+    of its children's values, so Nim values are limited to 62.
+
+    Returns:
+        tuple: (states, values): every state as a sorted uint64 array, and its Nim value.
+    """
+    states = np.sort(np.concatenate(list(layers.values())))
+    values = np.zeros(len(states), dtype=np.uint64)
+    for count in sorted(layers):
+        layer = layers[count]
+        seen = np.zeros(len(layer), dtype=np.uint64)
+        for bit, clear in zip(removed, cleared):
+            has_move = (layer & bit) != 0
+            seen[has_move] |= np.uint64(1) << values[np.searchsorted(states, layer[has_move] & ~clear)]
+        # The lowest unset bit of the bitset is the mex
+        layer_values = np.bitwise_count((~seen & (seen + np.uint64(1))) - np.uint64(1))
+        if (layer_values >= 63).any():
+            raise ValueError("the layered backend only handles Nim values below 63")
+        values[np.searchsorted(states, layer)] = layer_values
+    return states, values
+
+
+class LayeredBackend(SolverBackend):
+    """
+    Numpy layered solver. The solved states of every board are kept as a sorted array, so positions reachable from
+    a solved one are looked up without solving. solve_many solves all the new roots of a board in one pass.
+    """
+    name = "layered"
+
+    def __init__(self):
+        super().__init__()
+        # (states, values) of the solved positions by board key
+        self.tables = {}
+
+    def lookup(self, board, packed):
+        table = self.tables.get(board.key)
+        if table is None:
+            return None
+        states, values = table
+        i = np.searchsorted(states, np.uint64(packed))
+        return int(values[i]) if i < len(states) and states[i] == packed else None
+
+    def solve_roots(self, board, roots):
+        if len(board.vertices) + len(board.edges) + len(board.hyperedges) > MAX_ELEMENTS:
+            raise ValueError(f"the layered backend handles boards of at most {MAX_ELEMENTS} elements, not the {board.key} board")
+        removed, cleared = move_masks(board)
+        states, values = solve_layers(reachable_layers(roots, removed, cleared), removed, cleared)
+        if board.key in self.tables:
+            old_states, old_values = self.tables[board.key]
+            states, first = np.unique(np.concatenate([states, old_states]), return_index=True)
+            values = np.concatenate([values, old_values])[first]
+        self.tables[board.key] = (states, values)
+
+    def solve_position(self, board, state):
+        packed = NimStore.state_to_int(board, state)
+        nim_value = self.lookup(board, packed)
+        if nim_value is None:
+            self.solve_roots(board, [packed])
+            nim_value = self.lookup(board, packed)
+        return nim_value
+
+    def solve_many(self, positions):
+        positions = list(positions)
+        start = time.perf_counter()
+        new_roots = {}
+        for board, state in positions:
+            packed = NimStore.state_to_int(board, state)
+            if self.lookup(board, packed) is None:
+                new_roots.setdefault(board.key, (board, set()))[1].add(packed)
+        for board, roots in new_roots.values():
+            self.solve_roots(board, sorted(roots))
+        nim_values = [self.lookup(board, NimStore.state_to_int(board, state)) for board, state in positions]
+        self.seconds += time.perf_counter() - start
+        self.solved += len(positions)
+        return nim_values
+
+    def save_pack(self, board, filename):
+        """
+        Write every position solved on a board to a table, in the format of the packs BuildPacks.py writes. A board
+        solved from its full state gives its complete pack.
+        """
+        NimStore.save_board_positions(filename, board, *self.tables[board.key])
+
+    def memo_size(self):
+        return sum(len(states) for states, _ in self.tables.values())
+
+    def clear(self):
+        self.tables.clear()
+
+
+def external_unique(source, target, chunk_states, bits):
+    """
+    Append the distinct states of a file of unsorted uint64 states to target, in ascending order, and delete the
+    source. A file larger than chunk_states is split into 16 files by the 4 highest of its bits, which hold ascending
+    ranges of states, and each is sorted on its own.
+
+    Args:
+        source (str): File of raw uint64 states.
+        target (file): Binary file the sorted states are appended to.
+        chunk_states (int): Number of states sorted in memory at a time.
+        bits (int): All states of the file are below 2^bits.
+    """
+    size = os.path.getsize(source) // 8
+    if size <= chunk_states or bits <= 0:
+        # Below bits 0 every state of the file is the same, so its first chunk holds the only distinct state
+        np.unique(np.fromfile(source, dtype=np.uint64, count=min(size, chunk_states))).tofile(target)
+        os.remove(source)
+        return
+    shift = max(bits - 4, 0)
+    parts = [f"{source}.{i}" for i in range(16)]
+    files = [open(part, 'wb') for part in parts]
+    try:
+        states = np.memmap(source, dtype=np.uint64, mode='r')
+        for start in range(0, size, chunk_states):
+            chunk = np.array(states[start:start + chunk_states])
+            high = (chunk >> np.uint64(shift)) & np.uint64(15)
+            for i in np.unique(high).tolist():
+                chunk[high == i].tofile(files[i])
+        del states
+    finally:
+        for file in files:
+            file.close()
+    os.remove(source)
+    for part in parts:
+        external_unique(part, target, chunk_states, shift)
+
+
+class ExternalBackend(LayeredBackend):
+    """
+    The layered solver working from files, for boards whose positions do not fit in memory.
+
+    Reachable states are found layer by layer, most elements first. The children of a layer are appended to a spill
+    file for every smaller layer, and each spill file is sorted and deduplicated on disk (external_unique) when its
+    turn comes. Nim values are then found from the smallest layer up: for a chunk of a layer, the children of every
+    move are sorted and joined with the memory-mapped states and values of the smaller layers. Memory holds one chunk
+    at a time; the files take about 9 bytes per reachable state. Like the layered backend, it only takes boards of
+    at most MAX_ELEMENTS elements.
+
+    Like the layered backend, solve_many solves all the new roots of a board in one pass. Every pass keeps its own
+    tables, and lookups search all the tables of the board.
+    """
+    name = "external"
+
+    def __init__(self, memory=DEFAULT_EXTERNAL_MEMORY, directory=None, progress=None, cancel=None):
+        """
+        Args:
+            memory (int, optional): Bytes the solver may use, besides the pages of the memory-mapped files.
+                Defaults to DEFAULT_EXTERNAL_MEMORY.
+            directory (str, optional): Directory for the layer files. Defaults to a temporary directory deleted by
+                clear().
+            progress (function, optional): Called as progress(solved, remaining, elapsed) after every chunk.
+            cancel (CancellationToken, optional): Stops the solve with SolveCancelled when it is cancelled.
+        """
+        super().__init__()
+        self.memory = memory
+        self.directory = directory
+        self.owns_directory = directory is None
+        self.progress = progress
+        self.cancel = cancel
+        # Lists with the tables of every solve of a board, by board key. A table holds the memory-mapped
+        # (states, values) of every layer by number of remaining elements.
+        self.tables = {}
+
+    def lookup(self, board, packed):
+        for tables in self.tables.get(board.key, []):
+            layer = tables.get(packed.bit_count())
+            if layer is not None:
+                states, values = layer
+                i = int(np.searchsorted(states, np.uint64(packed)))
+                if i < len(states) and states[i] == packed:
+                    return int(values[i])
+        return None
+
+    def check_cancelled(self):
+        if self.cancel is not None and self.cancel.cancelled:
+            raise SolveCancelled()
+
+    def solve_roots(self, board, roots):
+        elements = len(board.vertices) + len(board.edges) + len(board.hyperedges)
+        if elements > MAX_ELEMENTS:
+            raise ValueError(f"the external backend handles boards of at most {MAX_ELEMENTS} elements, not the {board.key} board")
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix="takeaway-")
+        directory = os.path.join(self.directory, f"{board.key}-{len(self.tables.get(board.key, []))}")
+        os.makedirs(directory, exist_ok=True)
+        removed, cleared = move_masks(board)
+        # A chunk of parents holds a child state, its parent and its value for every move
+        chunk_states = max(1024, self.memory // (len(removed) * 24 + 32))
+        start = time.perf_counter()
+
+        # Find the layers, most elements first. Every layer only has children in smaller layers, so a layer's spill
+        # file is complete when its turn comes.
+        spill = lambda count: os.path.join(directory, f"spill-{count}.u64")
+        state_file = lambda count: os.path.join(directory, f"states-{count}.u64")
+        for root in roots:
+            with open(spill(root.bit_count()), 'ab') as file:
+                np.array([root], dtype=np.uint64).tofile(file)
+        counts = []
+        total = 0
+        for count in range(max(root.bit_count() for root in roots), -1, -1):
+            if not os.path.exists(spill(count)):
+                continue
+            with open(state_file(count), 'wb') as target:
+                external_unique(spill(count), target, chunk_states, elements)
+            counts.append(count)
+            states = np.memmap(state_file(count), dtype=np.uint64, mode='r')
+            total += len(states)
+            spill_files = {}
+            try:
+                for first in range(0, len(states), chunk_states):
+                    self.check_cancelled()
+                    layer = np.array(states[first:first + chunk_states])
+                    children = np.concatenate([layer[(layer & bit) != 0] & ~clear for bit, clear in zip(removed, cleared)])
+                    child_counts = np.bitwise_count(children)
+                    for child_count in np.unique(child_counts).tolist():
+                        if child_count not in spill_files:
+                            spill_files[child_count] = open(spill(child_count), 'ab')
+                        children[child_counts == child_count].tofile(spill_files[child_count])
+                    if self.progress is not None:
+                        self.progress(0, total, time.perf_counter() - start)
+            finally:
+                for file in spill_files.values():
+                    file.close()
+            del states
+
+        # Solve the layers, fewest elements first, against the memory-mapped values of the smaller layers
+        tables = {}
+        solved = 0
+        for count in reversed(counts):
+            states = np.memmap(state_file(count), dtype=np.uint64, mode='r')
+            values = np.lib.format.open_memmap(os.path.join(directory, f"values-{count}.npy"), mode='w+',
+                                               dtype=np.uint8, shape=(len(states),))
+            for first in range(0, len(states), chunk_states):
+                self.check_cancelled()
+                layer = np.array(states[first:first + chunk_states])
+                parents = []
+                children = []
+                for bit, clear in zip(removed, cleared):
+                    has_move = np.nonzero((layer & bit) != 0)[0]
+                    parents.append(has_move)
+                    children.append(layer[has_move] & ~clear)
+                parents = np.concatenate(parents)
+                children = np.concatenate(children)
+                # Sorted children read the memory-mapped layers below in one sequential pass
+                order = np.argsort(children)
+                parents, children = parents[order], children[order]
+                child_values = np.zeros(len(children), dtype=np.uint64)
+                child_counts = np.bitwise_count(children)
+                for child_count in np.unique(child_counts).tolist():
+                    selected = child_counts == child_count
+                    child_states, child_layer_values = tables[child_count]
+                    child_values[selected] = child_layer_values[np.searchsorted(child_states, children[selected])]
+                seen = np.zeros(len(layer), dtype=np.uint64)
+                np.bitwise_or.at(seen, parents, np.uint64(1) << child_values)
+                # The lowest unset bit of the bitset is the mex
+                layer_values = np.bitwise_count((~seen & (seen + np.uint64(1))) - np.uint64(1))
+                if (layer_values >= 63).any():
+                    raise ValueError("the external backend only handles Nim values below 63")
+                values[first:first + len(layer)] = layer_values
+                solved += len(layer)
+                if self.progress is not None:
+                    self.progress(solved, total - solved, time.perf_counter() - start)
+            values.flush()
+            tables[count] = (states, np.load(os.path.join(directory, f"values-{count}.npy"), mmap_mode='r'))
+        self.tables.setdefault(board.key, []).append(tables)
+
+    def memo_size(self):
+        return sum(len(states) for solves in self.tables.values() for tables in solves for states, _ in tables.values())
+
+    def clear(self):
+        self.tables.clear()
+        if self.owns_directory and self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+
+BACKENDS = {backend.name: backend for backend in [RecursiveBackend, BitmaskBackend, LayeredBackend, ExternalBackend]}
+
+
+def get_backend(name=None, **options):
+    """
+    A new solver backend.
+
+    Args:
+        name (str, optional): One of the names in BACKENDS. Defaults to the TAKEAWAY_SOLVER environment variable, or
+            DEFAULT_BACKEND if it is not set.
+        **options: Options of the backend, such as the memory and directory of the external backend.
+
+    Returns:
+        SolverBackend: The backend.
+    """
+    name = name or os.environ.get(BACKEND_VARIABLE) or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"unknown solver backend {name!r}; choose one of {', '.join(BACKENDS)}")
+    return BACKENDS[name](**options)
@@ -0,0 +1,191 @@
+import logging
+import time
+import Canonical
+import GameStates
+from Board import Board
+
+logger = logging.getLogger("takeaway.solver")
+
+
+class SolverStats:
+    """
+    Counters collected while instrumentation is enabled.
+
+    Attributes:
+        nodes_expanded (int): Positions whose moves were generated for their mex (memo misses).
+        hits_by_depth (dict): Solver calls answered from the memos by recursion depth.
+        misses_by_depth (dict): Expanded positions by recursion depth.
+        move_generation_time (float): Seconds spent generating moves.
+        mex_time (float): Seconds spent calculating mex values.
+        hashing_time (float): Seconds spent building memo keys (including canonical forms).
+        memo_growth (list): List of (seconds since enabled, memo size) samples.
+    """
+
+    def __init__(self, sample_every=1000, log_every=None):
+        """
+        Args:
+            sample_every (int, optional): Record the memo size every this many expanded positions. Defaults to 1000.
+            log_every (int, optional): Log a summary every this many expanded positions. Defaults to never.
+        """
+        self.sample_every = sample_every
+        self.log_every = log_every
+        self.started = time.perf_counter()
+        self.nodes_expanded = 0
+        # The recursion depth of the instrumented solvers, kept by counted()
+        self.depth = 0
+        self.hits_by_depth = {}
+        self.misses_by_depth = {}
+        self.move_generation_time = 0.0
+        self.mex_time = 0.0
+        self.hashing_time = 0.0
+        self.memo_growth = []
+
+    @property
+    def hits(self):
+        return sum(self.hits_by_depth.values())
+
+    @property
+    def misses(self):
+        return sum(self.misses_by_depth.values())
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def expand(self, depth=None):
+        """
+        Count one position whose moves are generated for its mex. The solvers in GameStates.py call this where they
+        compute the mex, while instrumentation is enabled.
+
+        Args:
+            depth (int, optional): The depth of the position. Defaults to the recursion depth of the instrumented
+                solvers.
+        """
+        depth = self.depth if depth is None else depth
+        self.misses_by_depth[depth] = self.misses_by_depth.get(depth, 0) + 1
+        self.nodes_expanded += 1
+        if self.nodes_expanded % self.sample_every == 0:
+            memo_size = len(GameStates.board_nim_values) + len(GameStates.canonical_nim_values) + len(GameStates.nim_values)
+            self.memo_growth.append((time.perf_counter() - self.started, memo_size))
+        if self.log_every and self.nodes_expanded % self.log_every == 0:
+            logger.info("%s", self)
+
+    def hit(self, depth):
+        """
+        Count one call of a solver answered from the memos without expanding any position.
+
+        Args:
+            depth (int): The recursion depth of the call.
+        """
+        self.hits_by_depth[depth] = self.hits_by_depth.get(depth, 0) + 1
+
+    def summary(self):
+        """
+        Returns:
+            dict: The counters as plain values, ready for json.dump.
+        """
+        return {
+            'nodes_expanded': self.nodes_expanded,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+            'hits_by_depth': dict(sorted(self.hits_by_depth.items())),
+            'misses_by_depth': dict(sorted(self.misses_by_depth.items())),
+            'move_generation_time': self.move_generation_time,
+            'mex_time': self.mex_time,
+            'hashing_time': self.hashing_time,
+            'memo_growth': self.memo_growth,
+        }
+
+    def __repr__(self):
+        return (f"SolverStats(nodes={self.nodes_expanded}, hit_rate={self.hit_rate:.2f}, "
+                f"moves={self.move_generation_time:.3f}s, mex={self.mex_time:.3f}s, hashing={self.hashing_time:.3f}s)")
+
+
+# The instrumented functions as (owner, attribute name, original) so they can be restored
+patched = []
+stats = None
+
+
+def timed(function, attribute):
+    """
+    Wrap a function so the time spent in it is added to an attribute of the active stats.
+    """
+    def wrapper(*args):
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            setattr(stats, attribute, getattr(stats, attribute) + time.perf_counter() - start)
+    return wrapper
+
+
+def counted(function):
+    """
+    Wrap a memoized recursive solver to keep the recursion depth of the active stats. A call during which no position
+    was expanded was answered from the memos and is counted as a hit; the expansions are counted by the solvers.
+    """
+    def wrapper(*args):
+        expanded = stats.nodes_expanded
+        stats.depth += 1
+        try:
+            return function(*args)
+        finally:
+            stats.depth -= 1
+            if stats.nodes_expanded == expanded:
+                stats.hit(stats.depth)
+    return wrapper
+
+
+def patch(owner, attribute, wrapper):
+    original = getattr(owner, attribute)
+    patched.append((owner, attribute, original))
+    setattr(owner, attribute, wrapper(original))
+
+
+def enable_instrumentation(sample_every=1000, log_every=None):
+    """
+    Start collecting statistics from the solvers in GameStates.py and, if it has been imported, TripartiteGraphs.py.
+    The solvers are only wrapped while instrumentation is enabled, and count their expansions only while
+    GameStates.stats is set, so it costs a check of a global when it is off.
+
+    Args:
+        sample_every (int, optional): Record the memo size every this many expanded positions. Defaults to 1000.
+        log_every (int, optional): Log a summary to the "takeaway.solver" logger every this many expanded positions.
+            Defaults to never.
+
+    Returns:
+        SolverStats: The statistics, updated while the solvers run.
+    """
+    global stats
+    disable_instrumentation()
+    stats = SolverStats(sample_every, log_every)
+
+    GameStates.stats = stats
+    patch(GameStates, 'calculate_board_nim_value', counted)
+    patch(GameStates, 'calculate_graph_nim_value', counted)
+    patch(GameStates, 'calculate_canonical_nim_value', counted)
+    # canonical_labeling does the work of the canonical forms of both positions and plain graphs
+    patch(Canonical, 'canonical_labeling', lambda f: timed(f, 'hashing_time'))
+    patch(GameStates, 'graph_invariants', lambda f: timed(f, 'hashing_time'))
+    patch(GameStates, 'position_key', lambda f: timed(f, 'hashing_time'))
+    patch(GameStates, 'mex', lambda f: timed(f, 'mex_time'))
+    patch(Board, 'distinct_moves', lambda f: timed(f, 'move_generation_time'))
+    patch(GameStates, 'graph_moves', lambda f: timed(f, 'move_generation_time'))
+
+    return stats
+
+
+def disable_instrumentation():
+    """
+    Restore the original solver functions.
+
+    Returns:
+        SolverStats: The statistics collected while instrumentation was enabled, or None.
+    """
+    GameStates.stats = None
+    while patched:
+        owner, attribute, original = patched.pop()
+        setattr(owner, attribute, original)
+    return stats
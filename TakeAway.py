@@ -2,9 +2,14 @@ import os
 import pygame
 import sys
 import random
-import pickle
-from GameStates import save_game_state, save_current_game_state, save_game_states_to_file, load_game_states_from_file, load_current_game_state, calculate_nim_value
-# from AI import get_possible_moves
+import json
+import threading
+import time
+from GameStates import save_game_state, save_current_game_state, save_game_states_to_file, load_game_states_from_file, load_current_game_state, calculate_nim_value_with_progress, resume_from_checkpoint, remove_checkpoint, CancellationToken, SolveCancelled, lookup_nim_value, calculate_nim_value_anytime, board_nim_values, position_key, packs, PACK_DIRECTORY
+import Planner
+import SolverBackends
+from Board import Board, iter_bits
+from AI import choose_move, COMPUTER_PLAYER, DIFFICULTY_BUDGETS
 # Dec 20, 2024
 # Set up the game window dimensions (These are pixels)
 width = 700
@@ -43,6 +48,16 @@ color_palettes = {
 
 nim_values = {}
 
+# Difficulty of the computer player (easy, medium or hard). Harder levels search longer for a winning move. It is
+# chosen in the settings and saved in custom_palette.json with the custom palette.
+ai_difficulty = "hard"
+# The version of the custom_palette.json layout. Files without one hold the custom palette alone, or the palette and
+# the difficulty.
+SETTINGS_VERSION = 1
+
+# The difficulty levels offered in the settings, easiest first
+DIFFICULTY_BUTTONS = sorted(DIFFICULTY_BUDGETS, key=DIFFICULTY_BUDGETS.get)
+
 # Default color palette
 current_palette = color_palettes["normal"]
 
@@ -398,7 +413,7 @@ def display_settings():
     Displays the settings screen.
     """
 
-    global current_palette, in_settings, in_menu
+    global current_palette, in_settings, in_menu, ai_difficulty
     screen.fill(WHITE)
     font = pygame.font.Font(None, 36)
     settings = [
@@ -429,6 +444,18 @@ def display_settings():
         # Add the button and palette to the list of buttons
         buttons.append((button_rect, palette))
 
+    # Create buttons for the difficulty of the computer player below the palettes
+    difficulty_text = font.render("Select the computer player difficulty", True, BLACK)
+    screen.blit(difficulty_text, (50, 150 + len(palettes) * 50))
+    difficulty_buttons = []
+    for i, difficulty in enumerate(DIFFICULTY_BUTTONS):
+        color = RED if difficulty == ai_difficulty else BLACK
+        button = font.render(difficulty.capitalize(), True, color)
+        button_rect = button.get_rect(center=(width // 2, 150 + (len(palettes) + 1 + i) * 50))
+        pygame.draw.rect(screen, color, button_rect, 2)
+        screen.blit(button, button_rect.topleft)
+        difficulty_buttons.append((button_rect, difficulty))
+
     # Create a button to return to the main menu
     return_button = font.render("Return to Menu", True, BLACK)
     return_button_rect = return_button.get_rect(center=(width // 2, height - 50))
@@ -458,6 +485,12 @@ def display_settings():
                             current_palette = color_palettes.get("custom", {})
                         in_settings = False
                         in_menu = True
+                for button_rect, difficulty in difficulty_buttons:
+                    if button_rect.collidepoint(event.pos):
+                        ai_difficulty = difficulty
+                        save_custom_palette()
+                        in_settings = False
+                        in_menu = True
                 if return_button_rect.collidepoint(event.pos):
                     in_settings = False
                     in_menu = True
@@ -493,13 +526,42 @@ def display_winner(winner):
     pygame.display.flip()
 
 def save_custom_palette():
-    with open('custom_palette.pkl', 'wb') as f:
-        pickle.dump(color_palettes["custom"], f)
+    """
+    Saves the custom palette, if there is one, and the difficulty of the computer player to custom_palette.json.
+    """
+    settings = {"version": SETTINGS_VERSION, "ai_difficulty": ai_difficulty}
+    if "custom" in color_palettes:
+        settings["palette"] = color_palettes["custom"]
+    with open('custom_palette.json', 'w') as f:
+        json.dump(settings, f)
 
 def load_custom_palette():
-    if os.path.exists('custom_palette.pkl'):
-        with open('custom_palette.pkl', 'rb') as f:
-            color_palettes["custom"] = pickle.load(f)
+    """
+    Loads the settings saved by save_custom_palette. A file that is damaged or from a newer version is ignored, and
+    the defaults are kept.
+    """
+    global ai_difficulty
+    try:
+        with open('custom_palette.json') as f:
+            settings = json.load(f)
+    except (OSError, ValueError):
+        return
+    if not isinstance(settings, dict) or settings.get("version", SETTINGS_VERSION) != SETTINGS_VERSION:
+        return
+    # Older files hold only the colors of the custom palette
+    colors = settings.get("palette") if "ai_difficulty" in settings else settings
+    if colors:
+        try:
+            # JSON stores the colors as lists
+            palette = {name: tuple(colors[name]) for name in color_palettes["normal"]}
+            if not all(len(color) == 3 and all(type(c) is int and 0 <= c <= 255 for c in color) for color in palette.values()):
+                raise ValueError
+        except (TypeError, KeyError, ValueError):
+            palette = None
+        if palette is not None:
+            color_palettes["custom"] = palette
+    if settings.get("ai_difficulty") in DIFFICULTY_BUDGETS:
+        ai_difficulty = settings["ai_difficulty"]
 
 def get_usernames():
     """
@@ -518,6 +580,7 @@ def get_usernames():
     input_box2 = pygame.Rect(width // 2 - 150, height // 2 + 15, 300, 50)
     default_button = pygame.Rect(width // 2 - 150, height // 2 + 100, 300, 50)
     random_button = pygame.Rect(width // 2 - 150, height // 2 + 175, 300, 50)
+    computer_button = pygame.Rect(width // 2 - 150, height // 2 + 250, 300, 50)
     active1 = False
     active2 = False
     text1 = ''
@@ -545,6 +608,10 @@ def get_usernames():
                 elif random_button.collidepoint(event.pos):
                     text1, text2 = f"{random.choice(colors)}{random.choice(animals)}{random.randint(1, 100)}", f"{random.choice(colors)}{random.choice(animals)}{random.randint(1, 100)}"
                     done = True
+                elif computer_button.collidepoint(event.pos):
+                    # Player 2 is played by the computer
+                    text1, text2 = text1 or "Player 1", COMPUTER_PLAYER
+                    done = True
                 else:
                     active1 = False
                     active2 = False
@@ -595,10 +662,13 @@ def get_usernames():
 
         default_text = font.render("Use Default Usernames", True, current_palette["text"])
         random_text = font.render("Use Random Usernames", True, current_palette["text"])
+        computer_text = font.render("Play vs Computer", True, current_palette["text"])
         screen.blit(default_text, (default_button.x + 10, default_button.y + 10))
         screen.blit(random_text, (random_button.x + 10, random_button.y + 10))
+        screen.blit(computer_text, (computer_button.x + 10, computer_button.y + 10))
         pygame.draw.rect(screen, current_palette["text"], default_button, 2)
         pygame.draw.rect(screen, current_palette["text"], random_button, 2)
+        pygame.draw.rect(screen, current_palette["text"], computer_button, 2)
 
         if active1:
             if pygame.time.get_ticks() - cursor_timer > 500:
@@ -825,6 +895,167 @@ def display_nim_value(vertices, edges, hyperedges, nim_value, rows, cols):
     pygame.display.flip()
     pygame.time.wait(3000)  # Display the result for 3 seconds
 
+def display_solve_progress(solved, remaining, elapsed, cancel):
+    """
+    Displays the progress of a running Nim value calculation and cancels it if the user presses Escape or closes the window.
+
+    Args:
+        solved (int): Number of positions solved so far.
+        remaining (int): Upper bound on the number of positions left to solve.
+        elapsed (float): Seconds since the calculation started.
+        cancel (CancellationToken): The token that stops the calculation.
+    """
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+            cancel.cancel()
+
+    # The remaining count is an upper bound, so the estimate is the longest the calculation can take at this speed
+    rate = solved / elapsed if elapsed else 0
+    lines = [
+        "Calculating the Nim value...",
+        f"Positions solved: {solved}",
+        f"Positions left (at most): {remaining}",
+        f"Time left (at most): {remaining / rate:.0f} s" if rate else "Time left: unknown",
+        "Press Esc to cancel."
+    ]
+    screen.fill(WHITE)
+    font = pygame.font.Font(None, 36)
+    for i, line in enumerate(lines):
+        text = font.render(line, True, BLACK)
+        screen.blit(text, (50, 50 + i * 40))
+    pygame.display.flip()
+
+def confirm_plan(plan):
+    """
+    Shows how the Nim value will be calculated and what it is expected to cost, and waits for the user to start or cancel.
+
+    Args:
+        plan (Planner.Plan): The plan of the calculation.
+
+    Returns:
+        bool: True if the user pressed Enter to start, False if they pressed Escape or closed the window.
+    """
+    lines = ["Calculating the Nim value with:"] + plan.describe() + ["Press Enter to start or Esc to cancel."]
+    screen.fill(WHITE)
+    font = pygame.font.Font(None, 36)
+    for i, line in enumerate(lines):
+        text = font.render(line, True, BLACK)
+        screen.blit(text, (50, 50 + i * 40))
+    pygame.display.flip()
+    while True:
+        event = pygame.event.wait()
+        if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+            return False
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_RETURN:
+            return True
+
+def display_background_progress(plan, elapsed, cancel):
+    """
+    Displays how long a calculation running in the background has taken, and cancels it if the user presses Escape
+    or closes the window.
+
+    Args:
+        plan (Planner.Plan): The plan of the calculation.
+        elapsed (float): Seconds since the calculation started.
+        cancel (CancellationToken): The token that stops the calculation.
+    """
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+            cancel.cancel()
+
+    limit = Planner.ANYTIME_SECONDS if plan.engine == "anytime" else plan.seconds
+    lines = [
+        f"Calculating the Nim value with the {plan.engine} engine...",
+        f"Time: {elapsed:.0f} s of about {limit:.0f} s",
+        "Press Esc to cancel."
+    ]
+    screen.fill(WHITE)
+    font = pygame.font.Font(None, 36)
+    for i, line in enumerate(lines):
+        text = font.render(line, True, BLACK)
+        screen.blit(text, (50, 50 + i * 40))
+    pygame.display.flip()
+
+def run_in_background(calculation, plan, cancel):
+    """
+    Runs a calculation that does not report its own progress in a worker thread, so the window keeps responding:
+    the progress screen is redrawn while it runs, and Esc or closing the window cancels it.
+
+    Args:
+        calculation (function): The calculation, called without arguments.
+        plan (Planner.Plan): The plan of the calculation, for the progress screen.
+        cancel (CancellationToken): Cancelled when the user cancels.
+
+    Returns:
+        The result of the calculation.
+
+    Raises:
+        SolveCancelled: If the user cancelled before the calculation finished.
+    """
+    outcome = {}
+
+    def work():
+        try:
+            outcome['result'] = calculation()
+        except Exception as error:
+            outcome['error'] = error
+
+    # A daemon thread, so a cancelled layered solve, which cannot stop halfway, never keeps the game from exiting
+    worker = threading.Thread(target=work, daemon=True)
+    start = time.perf_counter()
+    worker.start()
+    while worker.is_alive():
+        display_background_progress(plan, time.perf_counter() - start, cancel)
+        if cancel.cancelled:
+            raise SolveCancelled
+        worker.join(0.1)
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+def calculate_planned_nim_value(board, plan, show_progress, cancel, checkpoint):
+    """
+    Calculates the Nim value of the full board with the engine the plan chose. The engines that do not report
+    progress run in a worker thread (see run_in_background).
+
+    Returns:
+        The Nim value, or a description of what could be proven if an anytime search ran out of time.
+
+    Raises:
+        SolveCancelled: If the user cancelled the calculation.
+    """
+    state = board.full_state
+    if plan.engine == "lookup":
+        return lookup_nim_value(board, state)
+    if plan.engine == "layered":
+        backend = SolverBackends.get_backend("layered")
+        nim_value = run_in_background(lambda: backend.solve((board, state)), plan, cancel)
+        # Every position of the board was solved, so keep them all as its pack: the next request for this board,
+        # and the computer player, look them up instead of solving again
+        os.makedirs(PACK_DIRECTORY, exist_ok=True)
+        backend.save_pack(board, os.path.join(PACK_DIRECTORY, f"{board.key}.tawn"))
+        packs.pop(board.key, None)
+        board_nim_values[position_key(board, state)] = nim_value
+        return nim_value
+    if plan.engine == "external":
+        backend = SolverBackends.get_backend("external", memory=plan.memory, progress=show_progress, cancel=cancel)
+        try:
+            nim_value = backend.solve((board, state))
+        finally:
+            # The layer files are only needed for this board's value
+            backend.clear()
+        board_nim_values[position_key(board, state)] = nim_value
+        return nim_value
+    if plan.engine == "anytime":
+        result = run_in_background(lambda: calculate_nim_value_anytime(board, state, time_budget=Planner.ANYTIME_SECONDS, cancel=cancel), plan, cancel)
+        if result.exact:
+            return result.nim_value
+        return "not 0 (the first player wins)" if result.outcome == "N" else "unknown"
+    nim_value = calculate_nim_value_with_progress(board, state, show_progress, cancel, checkpoint=checkpoint)
+    # A board whose value is already in the memo is answered without writing a checkpoint
+    remove_checkpoint(checkpoint)
+    return nim_value
+
 def calculate_nim_value_menu():
     screen.fill(WHITE)
     font = pygame.font.Font(None, 36)
@@ -878,10 +1109,25 @@ def calculate_nim_value_menu():
                 elif event.key == pygame.K_RETURN:
                     rows = int(text_rows)
                     cols = int(text_cols)
-                    vertices = [(col * cell_size + cell_size // 2, row * cell_size + cell_size // 2) for row in range(rows) for col in range(cols)]
-                    edges = [(row * cols + col, row * cols + col + 1) for row in range(rows) for col in range(cols - 1)] + [(row * cols + col, (row + 1) * cols + col) for row in range(rows - 1) for col in range(cols)]
-                    hyperedges = [(row * cols + col, row * cols + col + 1, (row + 1) * cols + col + 1, (row + 1) * cols + col) for row in range(rows - 1) for col in range(cols - 1)]
-                    nim_value = calculate_nim_value(vertices, edges, hyperedges)
+                    board = Board.grid(rows, cols, cell_size)
+                    cancel = CancellationToken()
+                    show_progress = lambda solved, remaining, elapsed: display_solve_progress(solved, remaining, elapsed, cancel)
+                    # Long calculations are checkpointed, so closing the window does not throw the work away
+                    checkpoint = f'nim_checkpoint_{rows}x{cols}.tawn'
+                    try:
+                        if os.path.exists(checkpoint):
+                            _, _, nim_value = resume_from_checkpoint(checkpoint, show_progress, cancel)
+                            remove_checkpoint(checkpoint)
+                        else:
+                            # Show the estimated cost first, so nobody starts a calculation that takes days by accident
+                            plan = Planner.plan(board, board.full_state)
+                            if plan.engine != "lookup" and not confirm_plan(plan):
+                                return
+                            nim_value = calculate_planned_nim_value(board, plan, show_progress, cancel, checkpoint)
+                    except SolveCancelled:
+                        # Everything solved before cancelling stays in the memo and the checkpoint for the next try
+                        return
+                    vertices, edges, hyperedges = board.to_lists(board.full_state)
                     display_nim_value(vertices, edges, hyperedges, nim_value, rows, cols)
                     done = True
 
@@ -924,17 +1170,17 @@ def delete_existing_game_states_file(filename):
         os.remove(filename)
 
 def delete_current_game_state():
-    if os.path.exists('current_game_state.pkl'):
-        os.remove('current_game_state.pkl')
+    if os.path.exists('current_game_state.json'):
+        os.remove('current_game_state.json')
 
 def main():
     """
     Main function to run the game loop.
     """
-    # delete_existing_game_states_file('game_states.pkl')
+    # delete_existing_game_states_file('game_states.tawn')
     delete_current_game_state()
-    # Load the game states from a file when the game starts
-    load_game_states_from_file('game_states.pkl')
+    # Load the game states from a file in the background so the menu shows at once however many have been collected
+    load_game_states_from_file('game_states.tawn', background=True)
     load_custom_palette()
 
     # Initialize game state variables
@@ -949,7 +1195,9 @@ def main():
     player1, player2 = "", ""
     current_player = 1
     winner = ""
-    vertices, edges, hyperedges = [], [], []
+    rows, cols = 0, 0
+    board = Board.grid(rows, cols, cell_size)
+    state = board.full_state
     loaded_from_saved_state = False # Flag to check if the game was loaded from a saved state
 
     # Initialize Pygame with double buffering
@@ -984,19 +1232,17 @@ def main():
                         in_game = True
                         player1, player2 = get_usernames()
                         rows, cols = get_board_size()
-                        vertices = [(col * cell_size + cell_size // 2, row * cell_size + cell_size // 2) for row in
-                                    range(rows) for col in range(cols)]
-                        edges = [(row * cols + col, row * cols + col + 1) for row in range(rows) for col in
-                                 range(cols - 1)] + [(row * cols + col, (row + 1) * cols + col) for row in
-                                                     range(rows - 1) for col in range(cols)]
-                        hyperedges = [
-                            (row * cols + col, row * cols + col + 1, (row + 1) * cols + col + 1, (row + 1) * cols + col)
-                            for row in range(rows - 1) for col in range(cols - 1)]
+                        # Every vertex, edge and hyperedge keeps its ID for the whole game; moves only clear bits of the state
+                        board = Board.grid(rows, cols, cell_size)
+                        state = board.full_state
                     elif height // 2 - 150 < y < height // 2 - 50:
                         game_state = load_current_game_state()
                         if game_state:
                             vertices, edges, hyperedges = game_state['vertices'], game_state['edges'], game_state[
                                 'hyperedges']
+                            # load_current_game_state only returns saves that fit on a board of their size
+                            rows, cols = game_state['rows'], game_state['cols']
+                            board, state = Board.locate(vertices, edges, hyperedges, cell_size, rows, cols)
                             player1, player2 = game_state['player1'], game_state['player2']
                             current_player = game_state['current_player']
                             in_menu = False
@@ -1091,7 +1337,7 @@ def main():
             # offset_x = (width - cols * cell_size) // 2
             # offset_y = (height - rows * cell_size) // 2
             screen.fill(current_palette["background"])
-            draw_vertices_and_hyperedges(vertices, edges, hyperedges, offset_x, offset_y)
+            draw_vertices_and_hyperedges(*board.to_lists(state), offset_x, offset_y)
             font = pygame.font.Font(None, 36)
             hide_color1 = RED if current_player == 1 else (220, 220, 220)
             hide_color2 = RED if current_player == 2 else (220, 220, 220)
@@ -1103,13 +1349,13 @@ def main():
             while running and in_game:
                 for event in pygame.event.get():
                     if event.type == pygame.QUIT:
-                        save_current_game_state(vertices, edges, hyperedges, player1, player2, current_player)
+                        save_current_game_state(*board.to_lists(state), player1, player2, current_player, rows, cols)
                         in_game = False
                         in_menu = True
                         # running = False
                     elif event.type == pygame.KEYDOWN:
                         if event.key == pygame.K_ESCAPE:
-                            save_current_game_state(vertices, edges, hyperedges, player1, player2, current_player)
+                            save_current_game_state(*board.to_lists(state), player1, player2, current_player, rows, cols)
                             in_game = False
                             in_menu = True
                     elif event.type == pygame.MOUSEBUTTONDOWN:
@@ -1118,80 +1364,79 @@ def main():
                         # Check if the click is within the visible game grid
                         if offset_x <= x < offset_x + cols * cell_size and offset_y <= y < offset_y + rows * cell_size:
                             # Check if the click is inside a vertex
-                            for i, vertex in enumerate(vertices[:]):
+                            for v in iter_bits(state[0]):
+                                vertex = board.vertices[v]
                                 # Check if the click is within the radius of the vertex. If so, remove the vertex and its connected edges and hyperedges
                                 if distance(x, y, vertex[0] + offset_x, vertex[1] + offset_y) <= radius:
-                                    vertices.pop(i)
-                                    # Remove edges connected to the vertex
-                                    edges = [edge for edge in edges if i not in edge]
-                                    # Remove hyperedges connected to the vertex
-                                    hyperedges = [hyperedge for hyperedge in hyperedges if i not in hyperedge]
-                                    # Update indices in edges and hyperedges
-                                    edges = [(v1 if v1 < i else v1 - 1, v2 if v2 < i else v2 - 1) for v1, v2 in edges]
-                                    hyperedges = [[v if v < i else v - 1 for v in hyperedge] for hyperedge in hyperedges]
+                                    # Clear the vertex and its incident edges and hyperedges from the state; the other IDs do not change
+                                    state = board.remove_vertex(state, v)
 
                                     # Switch players
                                     current_player = 2 if current_player == 1 else 1
 
                                     # Save the game state by calling the save_game_state function
-                                    save_game_state(vertices, edges, hyperedges)
+                                    save_game_state(board, state)
                                     break
 
                             # Check if the click is on an edge
-                            for edge in edges[:]:
+                            for e in iter_bits(state[1]):
                                 # Get the start and end positions of the edge
-                                start_pos = (vertices[edge[0]][0] + offset_x, vertices[edge[0]][1] + offset_y)
-                                end_pos = (vertices[edge[1]][0] + offset_x, vertices[edge[1]][1] + offset_y)
+                                v1, v2 = board.edges[e]
+                                start_pos = (board.vertices[v1][0] + offset_x, board.vertices[v1][1] + offset_y)
+                                end_pos = (board.vertices[v2][0] + offset_x, board.vertices[v2][1] + offset_y)
 
                                 # Check if the click is near the edge (within a threshold distance).
                                 # If so, remove the edge and hyperedges connected to it.
                                 if point_near_line((x, y), start_pos, end_pos):
-                                    edges.remove(edge)
-                                    # Remove hyperedges connected to the edge
-                                    v1, v2 = edge
-                                    hyperedges = [hyperedge for hyperedge in hyperedges if not (v1 in hyperedge and v2 in hyperedge)]
+                                    state = board.remove_edge(state, e)
 
                                     # Switch players
                                     current_player = 2 if current_player == 1 else 1
 
                                     # Save the game state by calling the save_game_state function
-                                    save_game_state(vertices, edges, hyperedges,)
+                                    save_game_state(board, state)
                                     break
 
                             # Check if the click is inside a hyperedge
-                            for hyperedge in hyperedges[:]:
+                            for h in iter_bits(state[2]):
                                 # Get the vertices that form the hyperedge
-                                points = [(vertices[v][0] + offset_x, vertices[v][1] + offset_y) for v in hyperedge]
+                                points = [(board.vertices[v][0] + offset_x, board.vertices[v][1] + offset_y) for v in board.hyperedges[h]]
 
                                 # Check if the click is inside the polygon formed by the hyperedge vertices.
                                 if point_in_polygon((x, y), points):
                                     # Remove the hyperedge
-                                    hyperedges.remove(hyperedge)
+                                    state = board.remove_hyperedge(state, h)
 
                                     # Switch players
                                     current_player = 2 if current_player == 1 else 1
 
                                     # Save the game state by calling the save_game_state function
-                                    save_game_state(vertices, edges, hyperedges)
+                                    save_game_state(board, state)
                                     break
                         if width - 150 < x < width - 50 and height - 50 < y < height:
-                            save_current_game_state(vertices, edges, hyperedges, player1, player2, current_player)
-                            # save_game_states_to_file('game_states.pkl')
+                            save_current_game_state(*board.to_lists(state), player1, player2, current_player, rows, cols)
+                            # save_game_states_to_file('game_states.tawn')
                             in_game = False
                             in_menu = True
 
+                # Let the computer play its turn
+                if in_game and player2 == COMPUTER_PLAYER and current_player == 2 and not board.is_empty(state):
+                    _, _, state = choose_move(board, state, ai_difficulty)
+                    current_player = 1
+                    save_game_state(board, state)
+
                 # screen.fill(current_palette["background"])
                 # Check if the game is over (no vertices, edges, or hyperedges left)
-                if not vertices and not edges and not hyperedges:
+                if board.is_empty(state):
                     winner = player1 if current_player == 2 else player2
                     in_game = False
                     in_winner_screen = True
-                    # save_game_states_to_file('game_states.pkl')
+                    # save_game_states_to_file('game_states.tawn')
                     if loaded_from_saved_state:
                         delete_current_game_state()
                     print(f"Game over! {winner} wins!")
                 screen.fill(current_palette["background"])
-                draw_vertices_and_hyperedges(vertices, edges, hyperedges, offset_x, offset_y)
+                draw_vertices_and_hyperedges(*board.to_lists(state), offset_x, offset_y)
                 font = pygame.font.Font(None, 36)
                 hide_color1 =  RED if current_player == 1 else (220,220,220)
                 hide_color2 =  RED if current_player == 2 else (220,220,220)
@@ -1220,6 +1465,7 @@ def main():
                         if height // 2 < y < height // 2 + 100:
                             in_winner_screen = False
                             in_game = True
+                            state = board.full_state
                         elif height // 2 + 150 < y < height // 2 + 250:
                             in_winner_screen = False
                             in_menu = True
@@ -1251,7 +1497,7 @@ def main():
             # in_menu = True
 
     # Save the game states to a file when the game ends
-    save_game_states_to_file('game_states.pkl')
+    save_game_states_to_file('game_states.tawn')
 
 if __name__ == "__main__":
     main()
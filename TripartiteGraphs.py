@@ -1,14 +1,17 @@
 import math
+import os
  # Dec 21, 2024 NDXC-- Moving the program to a Pygame window.
 import pygame
 import re
 import numpy as np
 # Dec 19, 2024 NDXC-- This is a package that is not installed by default. You can install it with pip install oapackage.
 # It does not work, so I commented it out. Instead, I used networkx.
+# Isomorphic graphs are now recognized by Canonical.py, through GameStates.calculate_graph_nim_value.
 
 # import oapackage
 import pickle
-import networkx as nx
+import GameStates
+import NimStore
 
 from TakeAway import radius
 
@@ -39,12 +42,38 @@ edges = []
 input_active = None
 delete_mode = False
 
-# Load or initialize the graphs dictionary
-try:
+def graphKey(graph):
+    """
+    The key of a graph in the graphs dictionary (GameStates.graph_key): its number of vertices and its edges.
+    :param graph: A numpy array representing the graph
+    :return: The key as a tuple
+    """
+    rows, cols = np.nonzero(np.triu(graph, 1))
+    return GameStates.graph_key(len(graph), zip(rows.tolist(), cols.tolist()))
+
+
+def graphFromKey(key):
+    """
+    The adjacency matrix of a graph from its key in the graphs dictionary.
+    :param key: The key made by graphKey
+    :return: A numpy array representing the graph
+    """
+    n, edges = key
+    return attachEdges(np.zeros((n, n)), edges)
+
+
+# Nim values of the graphs solved so far by graphKey. This is the graph table of GameStates, so graphs solved here
+# and hypergraph endgames solved in the game share their values, including isomorphic graphs.
+graphs = GameStates.nim_values
+
+# Load the graphs dictionary. graphs.dict is the pickle used before NimStore tables, keyed by str(matrix); it is only
+# read when graphs.tawn does not exist yet and is replaced by it on the next save.
+if os.path.exists("graphs.tawn"):
+    GameStates.add_graph_nim_values(NimStore.load_graphs("graphs.tawn", graphKey))
+elif os.path.exists("graphs.dict"):
     with open("graphs.dict", "rb") as file:
-        graphs = pickle.load(file)
-except FileNotFoundError:
-    graphs = {}
+        GameStates.add_graph_nim_values({graphKey(NimStore.parse_graph_key(key)): nimValue
+                                         for key, nimValue in pickle.load(file).items()})
 
 def draw_text(text, x, y, color=BLACK, font_size=30):
     font = pygame.font.Font(None, font_size)
@@ -153,25 +182,6 @@ def point_near_line(point, start, end, threshold=5):
 #         inverse[p] = i
 #     return inverse
 
-def reduce(graph):
-    """
-    Dec 19, 2024 NDXC-- This function reduces the graph to its canonical form, which is defined as the graph with the smallest
-    lexicographically ordered adjacency matrix. This means that the graph is reduced to its smallest form.
-
-    :param graph: The graph to be reduced
-    :return: The reduced graph
-    """
-    # Dec 19, 2024 NDXC-- This has been commented out because the need package cannot be installed.
-    # tr = oapackage.reduceGraphNauty(graph, verbose=0)
-    # tri = inverse_permutation(tr)
-    #
-    # graph_reduced = oapackage.transformGraphMatrix(graph, tri)
-    # return graph_reduced
-    G = nx.from_numpy_array(graph)
-    G = nx.convert_node_labels_to_integers(G)
-    adj_matrix = nx.to_numpy_array(G)
-    return adj_matrix
-
 def attachEdges(graph, edges: []):
     """
     Dec 19, 2024 NDXC-- This function attaches the edges to the graph which is represented as a numpy array.
@@ -239,70 +249,10 @@ def getNimValue(original):
     :param original: A numpy array representing the graph
     :return: The nim value of the graph
     """
-    # Dec 19, 2024 NDXC-- This is a dictionary that stores the nim values of the graphs. This is used to store the
-    # nim values of the graphs that have already been calculated. Reduced is the reduced form of the graph. graphKey
-    # is the string representation of the reduced graph. nimValue is the nim value of the graph.
-    global graphs
-    reduced = reduce(original)
-    graphKey = str(reduced)
-    nimValue = graphs.get(graphKey, None)
-
-    # Dec 19, 2024 NDXC-- If the nim value of the graph has already been calculated, it returns the nim value.
-    if nimValue is not None:
-        return nimValue
-
-    #  Dec 19, 2024 NDXC-- This is the base case for the Sprague-Grundy theorem. If the graph is empty, the nim value is 0.
-    childGraphs = []
-
-    # Dec 19, 2024 NDXC-- This is the recursive case for the Sprague-Grundy theorem. It calculates the nim value of the
-    # graph by calculating the nim values of the child graphs. The nim value of the graph is the mex of the nim values of
-    # the child graphs.
-
-    # Dec 19, 2024 NDXC-- This loop gets the child graphs of the graph that are obtained by removing a vertex from the
-    #graph. The child graphs are stored in the childGraphs list.
-    for vertex in getVertexMoves(reduced):
-        # childGraphs.append(removeVertex(reduced, vertex))
-        # Dec 21, 2024 NDXC-- This is the list of child graphs that are obtained by removing a vertex from the graph.
-        childGraphs.append(np.delete(np.delete(reduced, vertex, 0), vertex, 1))
-
-    # Dec 21, 2024 NDXC-- These loops get the child graphs of the graph that are obtained by removing an edge from the
-    # graph. If the edge is in the graph, the edge is removed and the new graph is added to the childGraphs list.
-    for row in range(len(reduced)):
-        for col in range(row, len(reduced)):
-            if reduced[row, col] == 1:
-                new_graph = reduced.copy()
-                new_graph[row, col] = 0
-                new_graph[col, row] = 0
-                childGraphs.append(new_graph)
-                # childGraphs.append(removeEdge(reduced, (row, col)))
-
-    # Dec 19, 2024 NDXC-- This loop gets the child graphs of the graph obtained by removing an edge from the graph.
-    # The child graphs are stored in the childGraphs list.
-    # for edgeMove in getEdgeMoves(reduced):
-    #     childGraphs.append(removeEdge(reduced, edgeMove))
-
-    # Dec 19, 2024 NDXC-- This is the set of the nim values of the child graphs. This is used to calculate the mex of the
-    # nim values of the child graphs.
-    childNimValues = set()
-
-    # Dec 19, 2024 NDXC-- This loop calculates the nim values of the child graphs and adds them to the set of nim values.
-    for graph in childGraphs:
-        childNimValues.add(getNimValue(graph))
-
-    # Dec 19, 2024 NDXC-- childNimValues is converted to a list and sorted. This is used to find the mex of the nim values.
-    childNimValues = list(childNimValues)
-    childNimValues.sort()
-
-    # Dec 19, 2024 NDXC-- This loop finds the mex of the nim values of the child graphs. The mex is the smallest non-negative
-
-    for i in range(len(childNimValues)):
-        if i != childNimValues[i]:
-            graphs[graphKey] = i
-            return i
-
-    # add the next highest Nim Value in childNimValue
-    graphs[graphKey] = len(childNimValues)
-    return len(childNimValues)
+    # The graph is solved by the graph engine of GameStates, which splits it into connected components and shares
+    # the nim values of isomorphic graphs through its graphs table.
+    n, edges = graphKey(original)
+    return GameStates.calculate_graph_nim_value(n, edges)
 
 
 def main():
@@ -364,8 +314,8 @@ def main():
                         graph = np.zeros((len(vertices), len(vertices)), dtype=int)
                         graph = attachEdges(graph, edges)
                         result = getNimValue(graph)
-                        with open("graphs.dict", "wb") as file:
-                            pickle.dump(graphs, file)
+                        # Merge with the values other running instances saved instead of overwriting them
+                        GameStates.add_graph_nim_values(NimStore.merge_graphs("graphs.tawn", graphs, graphFromKey, graphKey))
                 # Dec 21, 2024 NDXC-- Restart button
                 elif 20+10+nim_value_width+10+10 <= event.pos[0] <= 20+10+nim_value_width+10+10+10+restart_width+10  and 140 <= event.pos[1] <= 190:
                     vertices = []
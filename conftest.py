@@ -0,0 +1,65 @@
+"""
+Shared fixtures and helpers of the tests: every test starts from empty memos, and brute_force gives the reference
+Nim values the solvers are checked against.
+"""
+import functools
+import pytest
+import GameStates
+
+
+def clear_memos():
+    for table in [GameStates.board_nim_values, GameStates.canonical_nim_values, GameStates.nim_values,
+                  GameStates.graph_buckets, GameStates.winning_positions,
+                  GameStates.canonical_winning_positions, GameStates.checkpoint_progress]:
+        table.clear()
+
+
+@pytest.fixture(autouse=True)
+def empty_memos(monkeypatch):
+    """
+    Every test starts from empty memos and ignores the precomputed packs.
+    """
+    monkeypatch.setattr(GameStates, 'use_packs', False)
+    GameStates.packs.clear()
+    clear_memos()
+    yield
+    clear_memos()
+    GameStates.packs.clear()
+
+
+@functools.lru_cache(maxsize=None)
+def brute_force(board, state):
+    """
+    The Nim value by plain recursion over every move, with no symmetries, components or canonical forms.
+    """
+    values = {brute_force(board, next_state) for _, _, next_state in board.moves(state)}
+    return next(value for value in range(len(values) + 1) if value not in values)
+
+
+def reachable_states(board, state):
+    """
+    Every position reachable from a position, itself included.
+    """
+    seen = {state}
+    stack = [state]
+    while stack:
+        for _, _, next_state in board.moves(stack.pop()):
+            if next_state not in seen:
+                seen.add(next_state)
+                stack.append(next_state)
+    return seen
+
+
+def random_state(board, rng):
+    """
+    A random reachable position: every edge and hyperedge is only kept if its vertices (and edges) are.
+    """
+    vertex_mask = sum(1 << v for v in range(len(board.vertices)) if rng.random() < 0.8)
+    edge_mask = sum(1 << e for e, (u, v) in enumerate(board.edges)
+                    if vertex_mask >> u & 1 and vertex_mask >> v & 1 and rng.random() < 0.8)
+    hyperedge_mask = 0
+    for h, hyperedge in enumerate(board.hyperedges):
+        edges = [e for e in range(len(board.edges)) if board.edge_hyperedges[e] >> h & 1]
+        if all(vertex_mask >> v & 1 for v in hyperedge) and all(edge_mask >> e & 1 for e in edges) and rng.random() < 0.8:
+            hyperedge_mask |= 1 << h
+    return vertex_mask, edge_mask, hyperedge_mask
@@ -0,0 +1,83 @@
+"""
+Checks of the computer player and the anytime search it runs.
+"""
+import json
+import os
+import random
+import pytest
+import AI
+import GameStates
+from Board import Board
+from conftest import brute_force, random_state, reachable_states
+
+
+def test_choose_move_plays_a_winning_move():
+    board = Board.grid(2, 3)
+    rng = random.Random(0)
+    # With every position of the board in the memo, the choice is a lookup at every difficulty
+    for state in reachable_states(board, board.full_state):
+        GameStates.board_nim_values[GameStates.position_key(board, state)] = brute_force(board, state)
+    for state in [board.full_state] + [random_state(board, rng) for _ in range(20)]:
+        if not any(board.moves(state)):
+            continue
+        for difficulty in AI.DIFFICULTY_BUDGETS:
+            _, _, next_state = AI.choose_move(board, state, difficulty)
+            assert next_state in [move[2] for move in board.moves(state)]
+            if brute_force(board, state) != 0:
+                assert brute_force(board, next_state) == 0
+
+
+def test_difficulty_levels_search_longer_and_fit_in_a_frame():
+    budgets = [AI.DIFFICULTY_BUDGETS[difficulty] for difficulty in ["easy", "medium", "hard"]]
+    assert budgets == sorted(budgets)
+    assert budgets[-1] < 1 / 60
+
+
+def test_difficulty_is_saved_with_the_palette(tmp_path, monkeypatch):
+    monkeypatch.setenv('SDL_VIDEODRIVER', 'dummy')
+    pytest.importorskip('pygame')
+    import TakeAway
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(TakeAway, 'ai_difficulty', 'easy')
+    TakeAway.save_custom_palette()
+    monkeypatch.setattr(TakeAway, 'ai_difficulty', 'hard')
+    TakeAway.load_custom_palette()
+    assert TakeAway.ai_difficulty == 'easy'
+
+    # Files written before the difficulty was saved hold only the colors of the palette
+    colors = {"vertex": [1, 2, 3], "edge": [4, 5, 6], "hyperedge_fill": [7, 8, 9], "hyperedge_border": [1, 1, 1],
+              "text": [0, 0, 0], "background": [255, 255, 255]}
+    with open(os.path.join(tmp_path, 'custom_palette.json'), 'w') as f:
+        json.dump(colors, f)
+    TakeAway.load_custom_palette()
+    assert TakeAway.color_palettes["custom"]["vertex"] == (1, 2, 3)
+    assert TakeAway.ai_difficulty == 'easy'
+
+
+def test_anytime_search_stops_at_its_budget():
+    board = Board.grid(3, 3)
+    result = GameStates.calculate_nim_value_anytime(board, board.full_state, node_budget=50)
+    assert result.nim_value is None
+    assert result.nodes <= 51
+    # Whatever was proven before the budget ran out is right
+    for (_, _, next_state), nim_value in result.moves:
+        assert nim_value is None or nim_value == brute_force(board, next_state)
+    for (board_key, state), nim_value in GameStates.board_nim_values.items():
+        assert nim_value == brute_force(board, state)
+
+    result = GameStates.calculate_nim_value_anytime(board, board.full_state)
+    assert result.nim_value == brute_force(board, board.full_state)
+    assert result.outcome == ("P" if result.nim_value == 0 else "N")
+
+
+def test_anytime_search_computes_no_canonical_form_before_its_budget(monkeypatch):
+    board = Board.grid(3, 3)
+    # Once the graph memo is not empty, lookup_nim_value would canonicalize every move
+    GameStates.calculate_graph_nim_value(3, ((0, 1), (1, 2)))
+
+    def fail(*args):
+        raise AssertionError("canonical form computed")
+    monkeypatch.setattr(GameStates.Canonical, 'canonical_form', fail)
+    monkeypatch.setattr(GameStates.Canonical, 'graph_canonical_form', fail)
+    result = GameStates.calculate_nim_value_anytime(board, board.full_state, node_budget=0)
+    assert result.nim_value is None
@@ -0,0 +1,66 @@
+"""
+Checks of the solver backends against a brute-force search, and of choosing one from the command line.
+"""
+import random
+import sys
+import pytest
+import Solve
+import SolverBackends
+from Board import Board
+from conftest import brute_force, random_state
+
+
+def grid_positions(count):
+    rng = random.Random(0)
+    positions = []
+    for rows, cols in [(2, 2), (2, 3), (3, 3)]:
+        board = Board.grid(rows, cols)
+        positions.append((board, board.full_state))
+        positions += [(board, random_state(board, rng)) for _ in range(count)]
+    return positions
+
+
+@pytest.mark.parametrize('name', sorted(SolverBackends.BACKENDS))
+def test_backends_agree_with_brute_force(name, tmp_path):
+    options = {'directory': str(tmp_path)} if name == 'external' else {}
+    backend = SolverBackends.get_backend(name, **options)
+    positions = grid_positions(10)
+    try:
+        for board, state in positions:
+            assert backend.solve((board, state)) == brute_force(board, state), (board.key, state)
+        backend.clear()
+        assert backend.solve_many(positions) == [brute_force(board, state) for board, state in positions]
+    finally:
+        backend.clear()
+
+
+def run_solve(monkeypatch, *args):
+    monkeypatch.setattr(sys, 'argv', ['Solve.py', *args])
+    Solve.main()
+
+
+def test_solver_variable_picks_the_backend_of_new_solves(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv(SolverBackends.BACKEND_VARIABLE, 'layered')
+    run_solve(monkeypatch, '2', '3')
+    out, err = capsys.readouterr()
+    assert 'layered' in err and out.strip().endswith(str(brute_force(Board.grid(2, 3), Board.grid(2, 3).full_state)))
+
+    # It is not an error with --share, which always runs the checkpointed search
+    run_solve(monkeypatch, '2', '2', '--share', str(tmp_path / 'shared.tawn'))
+    assert (tmp_path / 'shared.tawn').exists()
+
+    monkeypatch.setenv(SolverBackends.BACKEND_VARIABLE, 'quantum')
+    with pytest.raises(SystemExit) as exit_info:
+        run_solve(monkeypatch, '2', '3')
+    assert exit_info.value.code == 2
+    assert SolverBackends.BACKEND_VARIABLE in capsys.readouterr().err
+
+
+def test_packed_backends_reject_boards_beyond_their_limit(monkeypatch, capsys):
+    monkeypatch.delenv(SolverBackends.BACKEND_VARIABLE, raising=False)
+    for name in ['layered', 'external']:
+        with pytest.raises(SystemExit) as exit_info:
+            run_solve(monkeypatch, '5', '5', '--backend', name)
+        assert exit_info.value.code == 2
+        assert str(SolverBackends.MAX_ELEMENTS) in capsys.readouterr().err
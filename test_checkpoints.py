@@ -0,0 +1,57 @@
+"""
+Checks of the checkpointed search: interrupting a solve and resuming it from its checkpoint and segments.
+"""
+import os
+import pytest
+import GameStates
+import NimStore
+from Board import Board
+from conftest import brute_force, clear_memos
+
+
+def interrupted_solve(board, checkpoint, solved_before_cancel):
+    cancel = GameStates.CancellationToken()
+
+    def progress(solved, remaining, elapsed):
+        if solved >= solved_before_cancel:
+            cancel.cancel()
+    with pytest.raises(GameStates.SolveCancelled):
+        # Checkpoint at every report, so the solve writes several segments
+        GameStates.calculate_nim_value_with_progress(board, board.full_state, progress, cancel, report_every=500,
+                                                     checkpoint=checkpoint, checkpoint_every=0)
+
+
+def test_checkpoint_resume(tmp_path):
+    board = Board.grid(3, 3)
+    checkpoint = str(tmp_path / 'checkpoint.tawn')
+    interrupted_solve(board, checkpoint, 2000)
+    assert os.path.exists(GameStates.checkpoint_segment(checkpoint, 1))
+
+    # Resume in a fresh memo, as a new process would
+    clear_memos()
+    resumed_board, root_state, nim_value = GameStates.resume_from_checkpoint(checkpoint)
+    assert resumed_board is board
+    assert root_state == board.full_state
+    assert nim_value == brute_force(board, board.full_state)
+    # Resuming compacted the segments into the checkpoint file
+    assert not os.path.exists(GameStates.checkpoint_segment(checkpoint, 1))
+
+    GameStates.remove_checkpoint(checkpoint)
+    assert os.listdir(tmp_path) == []
+
+
+def test_checkpoint_segments_hold_only_new_values(tmp_path):
+    board = Board.grid(3, 3)
+    checkpoint = str(tmp_path / 'checkpoint.tawn')
+    interrupted_solve(board, checkpoint, 2000)
+    tables = [checkpoint]
+    while os.path.exists(GameStates.checkpoint_segment(checkpoint, len(tables))):
+        tables.append(GameStates.checkpoint_segment(checkpoint, len(tables)))
+    assert len(tables) > 2
+    counts = [NimStore.read_header(table)[4] for table in tables]
+    # Every value of the memo was written exactly once
+    assert sum(counts) == len(GameStates.board_nim_values)
+    keys = set()
+    for table in tables:
+        keys.update(key for key, _ in NimStore.iter_positions(table))
+    assert keys == set(GameStates.board_nim_values)
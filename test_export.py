@@ -0,0 +1,45 @@
+"""
+Checks of the export of stored Nim values to CSV and JSON Lines.
+"""
+import csv
+import json
+import ExportNimValues
+import GameStates
+import NimStore
+from Board import Board, decode_state
+
+
+def test_export_round_trip(tmp_path):
+    board = Board.grid(2, 2)
+    positions = {(board.key, board.full_state): 3, (board.key, (0b11, 0b1, 0)): 2, (board.key, (0b1, 0, 0)): None}
+    table = str(tmp_path / 'game_states.tawn')
+    NimStore.save_positions(table, positions)
+
+    output = str(tmp_path / 'nim_values.jsonl')
+    assert ExportNimValues.export([table, table], output, unique=True) == len(positions)
+    with open(output) as f:
+        rows = [json.loads(line) for line in f]
+    assert {(row['board'], decode_state(row['state'])): row['nim_value'] for row in rows} == positions
+    for row in rows:
+        assert (row['rows'], row['cols']) == (2, 2)
+        assert row['moves'] == sum(mask.bit_count() for mask in decode_state(row['state']))
+
+    output = str(tmp_path / 'nim_values.csv')
+    assert ExportNimValues.export([table, table], output) == 2 * len(positions)
+    with open(output, newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert rows[0].keys() == set(ExportNimValues.FIELDS)
+    assert {row['nim_value'] for row in rows} == {'3', '2', ''}
+
+
+def test_export_reads_checkpoint_segments(tmp_path):
+    board = Board.grid(2, 3)
+    checkpoint = str(tmp_path / 'checkpoint.tawn')
+    GameStates.calculate_board_nim_value(board, (0b11, 0b1, 0))
+    GameStates.save_checkpoint(checkpoint, board, board.full_state, [])
+    GameStates.calculate_board_nim_value(board, board.full_state)
+    GameStates.save_checkpoint(checkpoint, board, board.full_state, [])
+    assert len(GameStates.checkpoint_tables(checkpoint)) == 2
+
+    output = str(tmp_path / 'nim_values.jsonl')
+    assert ExportNimValues.export([checkpoint], output) == len(GameStates.board_nim_values)
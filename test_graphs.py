@@ -0,0 +1,70 @@
+"""
+Checks of the plain graph engine shared by the game and the Tripartite Graphs calculator, against a brute-force
+search with no components, invariants or canonical forms.
+"""
+import functools
+import random
+import pytest
+import GameStates
+from Board import Board
+from conftest import random_state
+
+
+@functools.lru_cache(maxsize=None)
+def brute_force_graph(vertices, edges):
+    """
+    The Nim value of a graph given as frozensets of vertices and edges: a move removes a vertex with its edges, or
+    an edge.
+    """
+    values = {brute_force_graph(vertices - {v}, frozenset(e for e in edges if v not in e)) for v in vertices}
+    values |= {brute_force_graph(vertices, edges - {e}) for e in edges}
+    return next(value for value in range(len(values) + 1) if value not in values)
+
+
+def tripartite_edges(a, b, c):
+    parts = [range(0, a), range(a, a + b), range(a + b, a + b + c)]
+    return [(u, v) for i, part in enumerate(parts) for other in parts[i + 1:] for u in part for v in other]
+
+
+@pytest.mark.parametrize('a, b, c', [(1, 1, 1), (1, 1, 2), (1, 2, 2), (2, 2, 2), (1, 1, 3), (1, 2, 3)])
+def test_tripartite_graphs_agree_with_brute_force(a, b, c):
+    n, edges = a + b + c, tripartite_edges(a, b, c)
+    assert GameStates.calculate_graph_nim_value(n, edges) == brute_force_graph(frozenset(range(n)), frozenset(edges))
+
+
+def test_random_graphs_agree_with_brute_force():
+    rng = random.Random(5)
+    for _ in range(40):
+        n = rng.randint(1, 6)
+        edges = [(u, v) for u in range(n) for v in range(u + 1, n) if rng.random() < 0.5]
+        # Relabeled copies are answered from the canonical forms of the graphs solved before them
+        labels = list(range(n))
+        rng.shuffle(labels)
+        for graph in [edges, [(labels[u], labels[v]) for u, v in edges]]:
+            assert GameStates.calculate_graph_nim_value(n, graph) == brute_force_graph(frozenset(range(n)), frozenset(graph))
+
+
+def test_positions_without_hyperedges_share_the_graph_table():
+    board = Board.grid(2, 3)
+    rng = random.Random(6)
+    for _ in range(20):
+        vertex_mask, edge_mask, _ = random_state(board, rng)
+        state = (vertex_mask, edge_mask, 0)
+        n, edges = GameStates.board_graph(board, state)
+        GameStates.nim_values.clear()
+        GameStates.graph_buckets.clear()
+        GameStates.calculate_graph_nim_value(n, edges)
+        # The graph solved first is looked up, not searched again, when the position is reached on the board
+        assert GameStates.lookup_nim_value(board, state) == brute_force_graph(frozenset(range(n)), frozenset(edges))
+
+
+def test_calculator_uses_the_shared_engine(tmp_path, monkeypatch):
+    monkeypatch.setenv('SDL_VIDEODRIVER', 'dummy')
+    pytest.importorskip('pygame')
+    np = pytest.importorskip('numpy')
+    monkeypatch.chdir(tmp_path)
+    import TripartiteGraphs
+    n, edges = 5, tripartite_edges(1, 2, 2)
+    graph = TripartiteGraphs.attachEdges(np.zeros((n, n), dtype=int), edges)
+    assert int(TripartiteGraphs.getNimValue(graph)) == brute_force_graph(frozenset(range(n)), frozenset(edges))
+    assert GameStates.lookup_graph_nim_value(n, edges) is not None
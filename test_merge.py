@@ -0,0 +1,54 @@
+"""
+Checks of merging Nim value tables: shared tables written by several processes, and the merge tool.
+"""
+import random
+import sys
+import pytest
+import GameStates
+import MergeNimTables
+import NimStore
+from Board import Board, encode_state
+from conftest import random_state
+
+
+def test_nimstore_merge_keeps_known_values(tmp_path):
+    board = Board.grid(2, 3)
+    states = [random_state(board, random.Random(seed)) for seed in range(3)]
+    keys = [GameStates.position_key(board, state) for state in states]
+    filename = str(tmp_path / 'shared.tawn')
+    NimStore.merge_positions(filename, [(keys[0], 1), (keys[1], None)])
+    merged = NimStore.merge_positions(filename, [(keys[0], None), (keys[1], 2), (keys[2], 0)])
+    assert merged == {keys[0]: 1, keys[1]: 2, keys[2]: 0}
+    assert dict(NimStore.iter_positions(filename)) == merged
+
+
+def test_merge_tables_reports_conflicts(tmp_path):
+    board = Board.grid(2, 2)
+    keys = [GameStates.position_key(board, random_state(board, random.Random(seed))) for seed in range(4)]
+    keys = list(dict.fromkeys(keys))
+    first, second, output = (str(tmp_path / name) for name in ['first.tawn', 'second.tawn', 'merged.tawn'])
+    NimStore.save_positions(first, {keys[0]: 1, keys[1]: None})
+    NimStore.save_positions(second, {keys[0]: 2, keys[1]: 3, keys[-1]: 0})
+
+    reported = []
+    count, conflicts = NimStore.merge_tables([first, second], output, chunk_size=1,
+                                             on_conflict=lambda *conflict: reported.append(conflict))
+    assert (count, conflicts) == (len(keys[:2] + keys[-1:]), 1)
+    # The earlier table wins the conflict, and a known value replaces an unknown one
+    assert reported == [(f"board 2x2 state {encode_state(keys[0][1])}", 1, 2)]
+    assert dict(NimStore.iter_positions(output)) == {keys[0]: 1, keys[1]: 3, keys[-1]: 0}
+
+
+def test_merge_tool_rejects_invalid_tables(tmp_path, monkeypatch, capsys):
+    positions, graphs, broken = (str(tmp_path / name) for name in ['positions.tawn', 'graphs.tawn', 'broken.tawn'])
+    board = Board.grid(2, 2)
+    NimStore.save_positions(positions, {GameStates.position_key(board, board.full_state): 3})
+    NimStore.save_graphs(graphs, {})
+    with open(broken, 'wb') as f:
+        f.write(b'not a table')
+    for inputs in [[positions, graphs], [positions, broken]]:
+        monkeypatch.setattr(sys, 'argv', ['MergeNimTables.py', *inputs, '-o', str(tmp_path / 'merged.tawn')])
+        with pytest.raises(SystemExit) as exit_info:
+            MergeNimTables.main()
+        assert exit_info.value.code == 2
+        assert 'error:' in capsys.readouterr().err
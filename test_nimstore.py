@@ -0,0 +1,87 @@
+"""
+Checks of the .tawn tables and the JSON saves: round trips, and damaged or foreign files being rejected.
+"""
+import json
+import random
+import pytest
+import GameStates
+import NimStore
+from Board import Board
+from conftest import random_state
+
+
+@pytest.mark.parametrize('rows, cols', [(3, 3), (5, 5)])
+def test_nimstore_round_trip(tmp_path, rows, cols):
+    # The 5x5 grid has more than 64 vertices, edges and hyperedges, so its keys take two words
+    board = Board.grid(rows, cols)
+    other = Board([(0, 0), (10, 0), (0, 10)], [(0, 1), (1, 2)], [(0, 1, 2)])
+    rng = random.Random(2)
+    positions = {GameStates.position_key(board, random_state(board, rng)): rng.choice([None, 0, 1, 2]) for _ in range(50)}
+    positions[GameStates.position_key(other, other.full_state)] = 1
+    filename = str(tmp_path / 'positions.tawn')
+    NimStore.save_positions(filename, positions.items())
+
+    assert dict(NimStore.iter_positions(filename)) == positions
+    table = NimStore.PositionTable(filename)
+    for key, nim_value in positions.items():
+        assert table.get(key) == nim_value
+    assert table.get(GameStates.position_key(Board.grid(2, 2), Board.grid(2, 2).full_state)) is None
+
+
+def test_nimstore_rejects_records_of_unlisted_boards(tmp_path):
+    board = Board.grid(2, 2)
+    filename = str(tmp_path / 'positions.tawn')
+    NimStore.save_positions(filename, [(GameStates.position_key(board, board.full_state), 3)])
+    kind, meta, records = NimStore.read_table(filename)
+    records['group'] = 5
+    NimStore.write_table(filename, kind, meta, records)
+    with pytest.raises(NimStore.NimStoreError):
+        list(NimStore.iter_positions(filename))
+    with pytest.raises(NimStore.NimStoreError):
+        NimStore.PositionTable(filename)
+
+
+def test_nimstore_rejects_other_files(tmp_path):
+    filename = str(tmp_path / 'game_states.tawn')
+    with open(filename, 'wb') as f:
+        f.write(b'\x80\x04not a table')
+    with pytest.raises(NimStore.NimStoreError):
+        NimStore.read_header(filename)
+
+
+def test_current_game_state_round_trip(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    board = Board.grid(2, 3)
+    vertices, edges, hyperedges = board.to_lists(board.full_state)
+    GameStates.save_current_game_state(vertices, edges, hyperedges, "Ann", "Bo", "Bo", 2, 3)
+    state = GameStates.load_current_game_state()
+    assert (state['rows'], state['cols'], state['current_player']) == (2, 3, "Bo")
+    assert state['vertices'] == [tuple(vertex) for vertex in vertices]
+
+
+@pytest.mark.parametrize('text', ['{"version": 1, "vertices": [', '[1, 2]', '{"version": 1}',
+                                  '{"version": 99, "vertices": [[0, 0]]}',
+                                  json.dumps({"version": 1, "vertices": [[0, 0]], "edges": [[0, 7]], "hyperedges": [],
+                                              "player1": "A", "player2": "B", "current_player": "A",
+                                              "game_over": False, "rows": 1, "cols": 1})])
+def test_damaged_current_game_state_is_ignored(tmp_path, monkeypatch, text):
+    monkeypatch.chdir(tmp_path)
+    with open('current_game_state.json', 'w') as f:
+        f.write(text)
+    assert GameStates.load_current_game_state() is None
+
+
+@pytest.mark.parametrize('text', ['{"version": 1, "ai_difficulty": "ea', '{"version": 2, "ai_difficulty": "easy"}',
+                                  '{"version": 1, "ai_difficulty": "easy", "palette": {"vertex": [1, 2]}}'])
+def test_damaged_settings_keep_the_defaults(tmp_path, monkeypatch, text):
+    monkeypatch.setenv('SDL_VIDEODRIVER', 'dummy')
+    pytest.importorskip('pygame')
+    import TakeAway
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(TakeAway, 'ai_difficulty', 'hard')
+    monkeypatch.delitem(TakeAway.color_palettes, 'custom', raising=False)
+    with open('custom_palette.json', 'w') as f:
+        f.write(text)
+    TakeAway.load_custom_palette()
+    assert 'custom' not in TakeAway.color_palettes
+    assert TakeAway.ai_difficulty == ('easy' if '"palette"' in text else 'hard')
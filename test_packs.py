@@ -0,0 +1,55 @@
+"""
+Checks of the precomputed packs: both ways of building one hold every position of the grid, and lookups use them.
+"""
+import random
+import pytest
+import AI
+import BuildPacks
+import GameStates
+import SolverBackends
+from Board import Board
+from conftest import brute_force, random_state, reachable_states
+
+
+@pytest.fixture
+def pack_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(GameStates, 'PACK_DIRECTORY', str(tmp_path))
+    monkeypatch.setattr(GameStates, 'use_packs', True)
+    return tmp_path
+
+
+@pytest.mark.parametrize('builder', ['BuildPacks', 'layered'])
+def test_pack_holds_every_position(pack_directory, builder):
+    board = Board.grid(2, 3)
+    filename = str(pack_directory / f"{board.key}.tawn")
+    if builder == 'BuildPacks':
+        BuildPacks.build_pack(2, 3, str(pack_directory))
+    else:
+        backend = SolverBackends.get_backend('layered')
+        backend.solve((board, board.full_state))
+        backend.save_pack(board, filename)
+    # Building the pack leaves nothing behind in the memos, so every value below comes from the pack
+    GameStates.board_nim_values.clear()
+
+    states = reachable_states(board, board.full_state)
+    assert len(GameStates.get_pack(board)) == len(states)
+    for state in states:
+        assert GameStates.lookup_nim_value(board, state, canonical=False) == brute_force(board, state)
+    assert not GameStates.board_nim_values
+
+
+def test_computer_player_uses_the_pack(pack_directory):
+    board = Board.grid(2, 3)
+    BuildPacks.build_pack(2, 3, str(pack_directory))
+    rng = random.Random(4)
+    for state in [board.full_state] + [random_state(board, rng) for _ in range(10)]:
+        if brute_force(board, state) != 0:
+            # Even the easiest level finds the winning move at once when every value is in the pack
+            _, _, next_state = AI.choose_move(board, state, 'easy')
+            assert brute_force(board, next_state) == 0
+
+
+def test_boards_without_a_pack_are_solved(pack_directory):
+    board = Board.grid(2, 2)
+    assert GameStates.get_pack(board) is None
+    assert GameStates.lookup_nim_value(board, board.full_state) is None
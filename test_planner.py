@@ -0,0 +1,48 @@
+"""
+Checks of the planner that picks the engine of a Nim value calculation, and of cancelling the anytime search it
+falls back to.
+"""
+import pytest
+import GameStates
+import Planner
+import SolverBackends
+from Board import Board
+from conftest import reachable_states
+
+
+@pytest.mark.parametrize('rows, cols', [(2, 3), (2, 4), (3, 3)])
+def test_estimate_is_close_to_the_reachable_positions(rows, cols):
+    board = Board.grid(rows, cols)
+    assert Planner.estimate_states(board, board.full_state) == pytest.approx(len(reachable_states(board, board.full_state)), rel=0.25)
+
+
+def test_small_boards_are_solved_in_bulk_and_then_looked_up():
+    board = Board.grid(3, 3)
+    plan = Planner.plan(board, board.full_state)
+    assert plan.engine == "layered"
+    assert plan.seconds <= Planner.LAYERED_MAX_SECONDS
+    GameStates.board_nim_values[GameStates.position_key(board, board.full_state)] = 1
+    assert Planner.plan(board, board.full_state).engine == "lookup"
+
+
+def test_boards_that_do_not_fit_in_memory_get_another_engine():
+    board = Board.grid(3, 3)
+    assert Planner.plan(board, board.full_state, memory=1).engine in ["external", "anytime"]
+
+
+def test_cancelled_anytime_search_stops():
+    board = Board.grid(4, 4)
+    cancel = GameStates.CancellationToken()
+    cancel.cancel()
+    result = GameStates.calculate_nim_value_anytime(board, board.full_state, time_budget=Planner.ANYTIME_SECONDS, cancel=cancel)
+    assert result.nim_value is None
+    assert result.nodes <= 1
+
+
+def test_boards_beyond_the_layered_limit_never_get_the_packed_engines():
+    board = Board.grid(5, 5)
+    assert len(board.vertices) + len(board.edges) + len(board.hyperedges) > SolverBackends.MAX_ELEMENTS
+    for memory in [1, 2**20, 2**40]:
+        assert Planner.plan(board, board.full_state, memory=memory).engine not in ["layered", "external"]
+    with pytest.raises(ValueError):
+        SolverBackends.get_backend("layered").solve((board, board.full_state))
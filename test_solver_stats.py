@@ -0,0 +1,34 @@
+"""
+Checks of the solver instrumentation.
+"""
+import GameStates
+import SolverStats
+from Board import Board
+
+
+def test_nodes_expanded_counts_every_mex():
+    board = Board.grid(3, 3)
+    stats = SolverStats.enable_instrumentation(sample_every=10)
+    try:
+        GameStates.calculate_canonical_nim_value(board, board.full_state)
+    finally:
+        SolverStats.disable_instrumentation()
+    # Every connected position with hyperedges is expanded once per canonical form, and every connected graph once
+    assert stats.nodes_expanded == len(GameStates.canonical_nim_values) + sum(
+        len(bucket['forms']) if bucket['forms'] is not None else len(bucket['graphs'])
+        for bucket in GameStates.graph_buckets.values())
+    assert stats.misses == stats.nodes_expanded
+    assert 0 < stats.hit_rate < 1
+    assert len(stats.memo_growth) == stats.nodes_expanded // 10
+
+
+def test_instrumentation_is_removed_when_disabled():
+    original = GameStates.calculate_board_nim_value
+    stats = SolverStats.enable_instrumentation()
+    SolverStats.disable_instrumentation()
+    assert GameStates.calculate_board_nim_value is original
+    assert GameStates.stats is None
+
+    board = Board.grid(2, 2)
+    GameStates.calculate_board_nim_value(board, board.full_state)
+    assert stats.nodes_expanded == 0
@@ -0,0 +1,54 @@
+"""
+Checks of the solvers against a brute-force search over every move (see conftest.py).
+"""
+import collections
+import random
+import GameStates
+from Board import Board
+from conftest import brute_force, random_state
+
+
+def test_is_winning_position_agrees_with_brute_force():
+    rng = random.Random(3)
+    for rows, cols in [(2, 2), (2, 3), (3, 3)]:
+        board = Board.grid(rows, cols)
+        for state in [board.full_state] + [random_state(board, rng) for _ in range(30)]:
+            assert GameStates.is_winning_position(board, state) == (brute_force(board, state) != 0)
+
+
+def test_is_winning_position_shares_isomorphic_positions():
+    # The 2x3 and 3x2 grids are the same board turned a quarter, so the second is decided from the canonical memo
+    GameStates.is_winning_position(Board.grid(2, 3), Board.grid(2, 3).full_state)
+    decided = len(GameStates.canonical_winning_positions)
+    board = Board.grid(3, 2)
+    assert GameStates.is_winning_position(board, board.full_state) == (brute_force(board, board.full_state) != 0)
+    assert len(GameStates.canonical_winning_positions) == decided
+
+
+def test_distinct_moves_keep_the_nim_value():
+    rng = random.Random(1)
+    for rows, cols in [(2, 2), (2, 3), (3, 3)]:
+        board = Board.grid(rows, cols)
+        assert board.symmetries
+        for state in [board.full_state] + [random_state(board, rng) for _ in range(20)]:
+            every_move = {brute_force(board, next_state) for _, _, next_state in board.moves(state)}
+            one_per_orbit = {brute_force(board, next_state) for _, _, next_state in board.distinct_moves(state)}
+            assert one_per_orbit == every_move
+            assert len(board.distinct_moves(state)) <= len(board.moves(state))
+            assert GameStates.calculate_board_nim_value(board, state) == brute_force(board, state)
+
+
+def test_graph_table_canonicalizes_each_graph_once(monkeypatch):
+    calls = collections.Counter()
+    graph_canonical_form = GameStates.Canonical.graph_canonical_form
+
+    def counted(n, edges):
+        calls[(n, tuple(edges))] += 1
+        return graph_canonical_form(n, edges)
+    monkeypatch.setattr(GameStates.Canonical, 'graph_canonical_form', counted)
+    # K_{2,2,2}: many of its subgraphs share their invariants, so their buckets get canonicalized
+    parts = [range(0, 2), range(2, 4), range(4, 6)]
+    edges = [(u, v) for i, part in enumerate(parts) for other in parts[i + 1:] for u in part for v in other]
+    GameStates.calculate_graph_nim_value(6, edges)
+    assert calls
+    assert max(calls.values()) == 1